@@ -1,22 +1,39 @@
 from fastapi import FastAPI
+from api.chaves import chaveiro
 from api.database import (
+    async_engine,
     create_db_and_tables, 
+    migrar_esquema,
     create_default_groups_and_permissions,
     create_user_admin
 )
+from api.security import encerrar_hash_pool
+from api.services.grupo import reconstruir_hierarquia
+from api.services.permissao import registro_permissoes, verificar_permissoes_efetivas
+from api.services.token import carregar_indice_refresh_tokens
 
 from .routes import main_router
 
-def lifespan(app: FastAPI):
+async def lifespan(app: FastAPI):
     """Função de ciclo de vida da aplicação."""
     
     # Executa na inicialização da aplicação
+    if chaveiro.assimetrico:
+        chaveiro.manter()
     create_db_and_tables()
+    migrar_esquema()
     create_default_groups_and_permissions()
+    reconstruir_hierarquia()
     create_user_admin()
+    divergencias = verificar_permissoes_efetivas()
+    if any(divergencias.values()):
+        print(f"Permissões efetivas reconstruídas: {divergencias}")
+    registro_permissoes.reconstruir()
+    carregar_indice_refresh_tokens()
     yield  # Separa a inicialização do encerramento
     # Executa no encerramento da aplicação
-    pass
+    encerrar_hash_pool()
+    await async_engine.dispose()
 
 app = FastAPI(
     title="API de Autenticação e Autorização",
@@ -1,22 +1,55 @@
 """Token baseado no auth"""
 
+import uuid
 from datetime import datetime, timedelta
 from dateutil import tz
-from typing import Optional, Union
+from typing import Iterable, Mapping, Optional, Union
 from functools import partial
 
 from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer
-from jose import JWTError, jwt
+from jose import JWTError
 from pydantic import BaseModel
 
-from api.services.usuario import get_usuario, get_usuario_grupos_permissoes
+from api.services.usuario import (
+    StatusUsuario,
+    get_usuario, 
+    get_usuario_async,
+    get_status_usuario,
+    get_status_usuarios,
+    get_usuario_grupos_permissoes,
+    get_usuario_grupos_permissoes_async
+)
+from api.services.permissao import registro_permissoes
+from api.services.token import (
+    consumir_refresh_token, 
+    familias_revogadas, 
+    jtis_consumidos, 
+    refresh_tokens_vigentes,
+    registrar_refresh_token
+)
 from api.models.usuario import Usuario
-from api.security import verificar_senha
-from api.config import SECRET_KEY, ALGORITHM
+from api.security import verificar_senha_async
+from api.cache import CacheClaims
+from api.chaves import chaveiro
+from api.jwt_backends import backend_jwt
+from api.config import (
+    SECRET_KEY, 
+    ALGORITHM, 
+    REFRESH_TOKEN_EXPIRE_MINUTES,
+    TOKEN_CACHE_SIZE, 
+    TOKEN_PERMISSOES_COMPACTAS
+)
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
+cache_claims = CacheClaims(tamanho_maximo=TOKEN_CACHE_SIZE)
+
+# Desafios da RFC 6750: o token inválido, expirado ou revogado se resolve
+# com um novo token; a falta de permissão, não
+DESAFIO_TOKEN_INVALIDO = {"WWW-Authenticate": 'Bearer error="invalid_token"'}
+DESAFIO_PERMISSAO_INSUFICIENTE = {"WWW-Authenticate": 'Bearer error="insufficient_scope"'}
+
 class Token(BaseModel):
     access_token: str
     refresh_token: str
@@ -37,20 +70,263 @@ def criar_access_token(
     """Cria um token de acesso"""
     
     to_encode = data.copy()
+    if "tv" not in to_encode and (nome_usuario := to_encode.get("sub")):
+        to_encode["tv"] = get_status_usuario(nome_usuario).token_version
     if expires_delta:
         expire = datetime.now(tz=tz.tzutc()) + expires_delta
     else:
         expire = datetime.now(tz=tz.tzutc()) + timedelta(minutes=30)
     to_encode.update({"exp": expire, "scope": scope})
-    encoded_jwt = jwt.encode(
+    if chaveiro.assimetrico:
+        chave = chaveiro.ativa
+        return backend_jwt.codificar(
+            to_encode, 
+            chave.privada, 
+            ALGORITHM,  # pyright: ignore
+            headers={"kid": chave.kid},
+        )
+    encoded_jwt = backend_jwt.codificar(
         to_encode, 
         SECRET_KEY,  # pyright: ignore
-        algorithm=ALGORITHM,  # pyright: ignore
+        ALGORITHM,  # pyright: ignore
     )
     return encoded_jwt
 
 criar_refresh_token = partial(criar_access_token, scope="refresh_token")
 
+def emitir_refresh_token(
+    nome_usuario: str, 
+    familia: Optional[str] = None,
+    token_version: Optional[int] = None
+) -> str:
+    """
+    Cria um refresh token com 'jti' e o registra na tabela de rotação.
+    Sem família informada, inicia uma nova família (um novo login).
+    Sem token_version informado, usa o do status em cache.
+    """
+    
+    jti = uuid.uuid4().hex
+    familia = familia or uuid.uuid4().hex
+    expires_delta = timedelta(minutes=REFRESH_TOKEN_EXPIRE_MINUTES) # pyright: ignore
+    
+    data = {"sub": nome_usuario, "jti": jti, "fam": familia}
+    if token_version is not None:
+        data["tv"] = token_version
+    refresh_token = criar_refresh_token(data=data, expires_delta=expires_delta)
+    registrar_refresh_token(
+        jti=jti,
+        familia=familia,
+        nome_usuario=nome_usuario,
+        expira_em=datetime.now(tz=tz.tzutc()) + expires_delta,
+    )
+    return refresh_token
+
+_NAO_CARREGADO = object()
+
+def decodificar_token(token: str) -> Mapping:
+    """Decodifica e valida a assinatura do token, consultando antes o cache"""
+    
+    if (claims := cache_claims.get(token)) is not None:
+        return claims
+    
+    kid = None
+    if chaveiro.assimetrico:
+        kid = backend_jwt.cabecalho(token).get("kid")
+        chave = chaveiro.chave_verificacao(kid)
+        if chave is None:
+            raise JWTError("Chave de assinatura desconhecida")
+    else:
+        chave = SECRET_KEY
+    payload = backend_jwt.decodificar(
+        token, 
+        chave,  # pyright: ignore
+        [ALGORITHM]  # pyright: ignore
+    )
+    return cache_claims.set(token, payload, kid=kid)
+
+def claims_permissoes(permissoes: Iterable[str]) -> dict:
+    """Retorna as claims de permissões do access token"""
+    
+    if not TOKEN_PERMISSOES_COMPACTAS:
+        return {"permissoes": permissoes}
+    
+    registro_permissoes.garantir_carregado()
+    mascara = registro_permissoes.compilar(permissoes, estrito=False)
+    return {
+        "pm": registro_permissoes.codificar(mascara),
+        "pv": registro_permissoes.assinatura(mascara),
+    }
+
+def mascara_permissoes_token(payload: Mapping) -> int:
+    """Converte as permissões presentes no token em uma máscara de bits"""
+    
+    if (pm := payload.get("pm")) is not None:
+        try:
+            mascara = registro_permissoes.decodificar(pm)
+        except ValueError:
+            return 0
+        # O bitset só é válido para o mesmo mapeamento id -> nome
+        if payload.get("pv") != registro_permissoes.assinatura(mascara):
+            return 0
+        return mascara
+    return registro_permissoes.compilar(payload.get("permissoes") or [], estrito=False)
+
+def introspectar_tokens(tokens: list[str]) -> list[dict]:
+    """
+    Introspecção de tokens em lote (RFC 7662). Reutiliza o cache de claims
+    e o de status dos usuários, buscando os usuários que faltam em lote.
+    Os refresh tokens são conferidos na tabela de rotação, também em lote.
+    """
+    
+    payloads: list[Optional[Mapping]] = []
+    for token in tokens:
+        try:
+            payloads.append(decodificar_token(token))
+        except JWTError:
+            payloads.append(None)
+            
+    status_usuarios = get_status_usuarios(
+        payload["sub"] for payload in payloads if payload and payload.get("sub")
+    )
+    registro_permissoes.garantir_carregado()
+    
+    # Os índices em memória só conhecem o que este processo consumiu ou revogou;
+    # os demais refresh tokens são conferidos na tabela de rotação, em lote
+    jtis_vigentes = refresh_tokens_vigentes([
+        payload.get("jti") for payload in payloads
+        if payload 
+        and payload.get("scope") == "refresh_token"
+        and payload.get("jti") not in jtis_consumidos
+        and payload.get("fam") not in familias_revogadas
+    ])
+    
+    resultados = []
+    for payload in payloads:
+        status_usuario = status_usuarios.get(payload.get("sub")) if payload else None
+        if (
+            status_usuario is None
+            or not status_usuario.ativo
+            or payload.get("tv", 0) != status_usuario.token_version
+        ):
+            resultados.append({"active": False})
+            continue
+        
+        scope = payload.get("scope")
+        if scope == "refresh_token":
+            if payload.get("jti") not in jtis_vigentes:
+                resultados.append({"active": False})
+                continue
+            permissoes = None
+        else:
+            permissoes = registro_permissoes.nomes(mascara_permissoes_token(payload))
+            
+        resultados.append({
+            "active": True,
+            "sub": payload["sub"],
+            "exp": payload.get("exp"),
+            "scope": scope,
+            "token_type": "Bearer",
+            "grupos": payload.get("grupos"),
+            "permissoes": permissoes,
+        })
+    return resultados
+
+def limpar_cache_claims():
+    """Descarta as claims em cache"""
+    
+    cache_claims.limpar()
+    
+# Tokens assinados por chaves aposentadas não podem continuar aceitos pelo cache
+chaveiro.ao_remover(cache_claims.remover_kids)
+
+def extrair_token(request: Request) -> Optional[str]:
+    """Extrai o token do cabeçalho Authorization ou do parâmetro 'token'"""
+    
+    if authorization := request.headers.get("authorization"):
+        try:
+            return authorization.split(" ")[1]
+        except IndexError:
+            return None
+    return request.query_params.get("token")
+
+class IdentidadeRequisicao:
+    """
+    Identidade associada a uma requisição.
+    Decodifica o token e carrega o usuário no máximo uma vez,
+    sendo compartilhada por todas as dependências de autenticação.
+    """
+    
+    def __init__(self, token: Optional[str]):
+        self.token = token
+        self._payload: Optional[Mapping] = None
+        self._erro: Optional[JWTError] = None
+        self._usuario = _NAO_CARREGADO
+        self._status: Optional[StatusUsuario] = None
+        self._mascara: Optional[int] = None
+        self._mascara_versao = -1
+        
+    @property
+    def payload(self) -> Mapping:
+        """Retorna as claims do token, lançando JWTError se for inválido"""
+        
+        if self._payload is None and self._erro is None:
+            try:
+                if not self.token:
+                    raise JWTError("Token não informado")
+                self._payload = decodificar_token(self.token)
+            except JWTError as e:
+                self._erro = e
+        if self._erro is not None:
+            raise self._erro
+        return self._payload
+    
+    @property
+    def usuario(self) -> Optional[Usuario]:
+        """Retorna o usuário do token, carregado uma única vez"""
+        
+        if self._usuario is _NAO_CARREGADO:
+            self._usuario = get_usuario(nome_usuario=self.payload.get("sub"))
+        return self._usuario
+    
+    @property
+    def status(self) -> StatusUsuario:
+        """Retorna o status do usuário do token, sem carregar o usuário"""
+        
+        if self._status is None:
+            self._status = get_status_usuario(self.payload.get("sub"))
+        return self._status
+    
+    @property
+    def revogado(self) -> bool:
+        """Indica se o usuário não existe mais ou se o token foi revogado"""
+        
+        status_usuario = self.status
+        return (
+            not status_usuario.existe 
+            or self.payload.get("tv", 0) != status_usuario.token_version
+        )
+    
+    @property
+    def mascara_permissoes(self) -> int:
+        """
+        Retorna as permissões do token como máscara de bits,
+        aceitando tanto a lista de nomes quanto o bitset compacto.
+        """
+        
+        if self._mascara_versao != registro_permissoes.versao:
+            self._mascara = mascara_permissoes_token(self.payload)
+            self._mascara_versao = registro_permissoes.versao
+        return self._mascara
+
+def get_identidade(request: Request) -> IdentidadeRequisicao:
+    """Retorna a identidade da requisição, criando-a no primeiro acesso"""
+    
+    identidade = getattr(request.state, "identidade", None)
+    if identidade is None:
+        identidade = IdentidadeRequisicao(extrair_token(request))
+        request.state.identidade = identidade
+    return identidade
+
 def valida_token(
     token: str = Depends(oauth2_scheme), 
     request: Request = None # pyright: ignore
@@ -60,48 +336,61 @@ def valida_token(
     excecao_credenciais = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Os dados informados estão incorretos. Por favor, verifique e tente novamente.",
-        headers={"WWW-Authenticate": "Bearer"},
+        headers=DESAFIO_TOKEN_INVALIDO,
     )
     
     if request:
-        if authorization := request.headers.get("authorization"):
-            try:
-                token = authorization.split(" ")[1]
-            except IndexError:
-                raise excecao_credenciais
+        identidade = get_identidade(request)
+    else:
+        identidade = IdentidadeRequisicao(token)
     
     try:
-        payload = jwt.decode(
-            token, 
-            SECRET_KEY,  # pyright: ignore
-            algorithms=[ALGORITHM]  # pyright: ignore
-        )
-        nome_usuario: str = payload.get("sub")
+        nome_usuario: str = identidade.payload.get("sub")
         if nome_usuario is None:
             raise excecao_credenciais
         token_data = TokenData(nome_usuario=nome_usuario)
-        usuario = get_usuario(nome_usuario=token_data.nome_usuario)
-        if not usuario:
+        if identidade.revogado:
             raise excecao_credenciais
     except JWTError:
         raise excecao_credenciais
     return token_data
 
-def autenticar_usuario(
+def rotacionar_refresh_token(token: str) -> tuple[TokenData, str]:
+    """
+    Valida e consome o refresh token, retornando os dados do token
+    e a família à qual o novo refresh token deve pertencer.
+    """
+    
+    excecao_credenciais = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Os dados informados estão incorretos. Por favor, verifique e tente novamente.",
+        headers=DESAFIO_TOKEN_INVALIDO,
+    )
+    
+    token_data = valida_token(token=token)
+    payload = decodificar_token(token)
+    jti, familia = payload.get("jti"), payload.get("fam")
+    if payload.get("scope") != "refresh_token" or not jti or not familia:
+        raise excecao_credenciais
+    
+    expira_em = datetime.fromtimestamp(payload["exp"], tz=tz.tzutc())
+    if not consumir_refresh_token(jti, familia, expira_em):
+        raise excecao_credenciais
+    return token_data, familia
+
+async def autenticar_usuario(
     nome_usuario: str, 
     senha: str
 ) -> Union[Usuario, bool]:
     """Autentica o usuário"""
     
-    usuario_grupo_permissoes = get_usuario_grupos_permissoes(nome_usuario)
+    usuario_grupo_permissoes = await get_usuario_grupos_permissoes_async(nome_usuario)
     if not usuario_grupo_permissoes:
         return False
-    usuario = usuario_grupo_permissoes[0]
-    grupos = usuario_grupo_permissoes[1]
-    permissoes = usuario_grupo_permissoes[2]
+    usuario, grupos, permissoes = usuario_grupo_permissoes
     if not usuario:
         return False
-    if not verificar_senha(senha, usuario.senha):
+    if not await verificar_senha_async(senha, usuario.senha):
         return False
     return usuario, grupos, permissoes
 
@@ -111,48 +400,51 @@ def buscar_usuario_atual(
 ) -> Usuario:
     """Retorna usuário autenticado"""
     
-    excecao_credenciais = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Os dados informados estão incorretos. Por favor, verifique e tente novamente.",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
-    
-    if request:
-        if authorization := request.headers.get("authorization"):
-            try:
-                token = authorization.split(" ")[1]
-                token_data = valida_token(token=token)
-                return get_usuario(nome_usuario=token_data.nome_usuario)
-            except IndexError:
-                raise excecao_credenciais
+    if request and request.headers.get("authorization"):
+        valida_token(request=request)
+        return get_identidade(request).usuario
             
     if token_data:
         return get_usuario(nome_usuario=token_data.nome_usuario)
     
 def buscar_usuario_grupo_permissoes_atual(
     token_data: TokenData = Depends(valida_token),
-) -> tuple[Usuario, list[str], list[str]]:
+) -> tuple[Usuario, tuple[str, ...], tuple[str, ...]]:
     """Busca o usuário, grupo e permissões atuais"""
     
     usuario, grupos, permissoes = get_usuario_grupos_permissoes(nome_usuario=token_data.nome_usuario)
     return usuario, grupos, permissoes
 
-async def buscar_usuario_atual_ativo(
-    usuario_autenticado: Usuario = Depends(buscar_usuario_atual)
-) -> Usuario:
-    """Busca o usuário atual ativo"""
+def buscar_identidade_ativa(
+    request: Request,
+    token_data: TokenData = Depends(valida_token),
+) -> IdentidadeRequisicao:
+    """
+    Verifica se o usuário do token está ativo usando o status em cache,
+    sem carregar o usuário
+    """
     
-    if not usuario_autenticado.ativo:
+    identidade = get_identidade(request)
+    if not identidade.status.ativo:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Usuário está desativado",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    return usuario_autenticado
+    return identidade
+
+IdentidadeAtiva = Depends(buscar_identidade_ativa)
+
+async def buscar_usuario_atual_ativo(
+    identidade: IdentidadeRequisicao = IdentidadeAtiva
+) -> Usuario:
+    """Busca o usuário atual ativo, para as rotas que precisam do registro completo"""
+    
+    return await get_usuario_async(identidade.payload.get("sub"))
 
 UsuarioAutenticado = Depends(buscar_usuario_atual_ativo)
 
-async def buscar_usuario_se_alterar_senha_for_permitido(
+def buscar_usuario_se_alterar_senha_for_permitido(
     *, 
     request: Request, 
     pwd_reset_token: Optional[str] = None, 
@@ -220,54 +512,59 @@ class ValidarPermissoes:
     ):
         self.permissoes_requeridas = permissoes_requeridas
         self.permissoes_usuario = permissoes_usuario
+        self._compilar()
         
-    async def __call__(
+    def _compilar(self):
+        """
+        Pré-compila as permissões requeridas em máscaras de bits, uma por
+        permissão, com as permissões que a concedem (curingas inclusos)
+        """
+        
+        self._versao = registro_permissoes.versao
+        self._requisitos = registro_permissoes.compilar_requisitos(self.permissoes_requeridas)
+        
+    def __call__(
         self,
         token: str = Depends(oauth2_scheme),
         request: Request = None,
     ):
         if request:
-            if authorization := request.headers.get("Authorization"):
-                try:
-                    token = authorization.split(" ")[1]
-                except IndexError:
-                    raise HTTPException(
-                        status_code=status.HTTP_401_UNAUTHORIZED,
-                        detail="Os dados informados estão incorretos. Por favor, verifique e tente novamente.",
-                        headers={"WWW-Authenticate": "Bearer"},
-                    )
-            else:
-                try:
-                    token = request.query_params["token"]
-                except KeyError:
-                    raise HTTPException(
-                        status_code=status.HTTP_401_UNAUTHORIZED,
-                        detail="Os dados informados estão incorretos. Por favor, verifique e tente novamente.",
-                        headers={"WWW-Authenticate": "Bearer"},
-                    )
+            identidade = get_identidade(request)
+        else:
+            identidade = IdentidadeRequisicao(token)
+        
+        if not identidade.token:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Os dados informados estão incorretos. Por favor, verifique e tente novamente.",
+                headers=DESAFIO_TOKEN_INVALIDO,
+            )
             
         try:
-            payload = jwt.decode(
-                token, 
-                SECRET_KEY,  # pyright: ignore
-                algorithms=[ALGORITHM]  # pyright: ignore
-            )
+            identidade.payload
         except JWTError:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Seu acesso não pôde ser validado. Tente fazer login novamente.",
-                headers={"WWW-Authenticate": "Bearer"},
+                headers=DESAFIO_TOKEN_INVALIDO,
+            )
+        
+        if identidade.revogado:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Os dados informados estão incorretos. Por favor, verifique e tente novamente.",
+                headers=DESAFIO_TOKEN_INVALIDO,
             )
         
-        permissoes_usuario = payload.get("permissoes")
-        token_permissoes_set = set(permissoes_usuario)
-        permissoes_requeridas_set = set(self.permissoes_requeridas)
-          
-        if set(["all:all"]).issubset(token_permissoes_set) or permissoes_requeridas_set.issubset(token_permissoes_set):
+        registro_permissoes.garantir_carregado()
+        if self._versao != registro_permissoes.versao:
+            self._compilar()
+        
+        if registro_permissoes.atende(identidade.mascara_permissoes, self._requisitos):
             return True
         else:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Você não tem permissão para acessar este recurso.",
-                headers={"WWW-Authenticate": "Bearer"},
+                headers=DESAFIO_PERMISSAO_INSUFICIENTE,
             )
\ No newline at end of file
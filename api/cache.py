@@ -0,0 +1,198 @@
+"""Caches em memória utilizados pela autenticação"""
+
+import hashlib
+import heapq
+import threading
+import time
+from collections import OrderedDict
+from types import MappingProxyType
+from typing import Any, Collection, Hashable, Mapping, Optional
+
+class CacheClaims:
+    """
+    Cache LRU de claims de tokens já verificados.
+    As entradas são indexadas pelo digest do token e nunca
+    são servidas depois do 'exp' do token.
+    """
+    
+    def __init__(self, tamanho_maximo: int):
+        self.tamanho_maximo = tamanho_maximo
+        self.acertos = 0
+        self.falhas = 0
+        self._itens: OrderedDict[bytes, tuple[float, Optional[str], Mapping]] = OrderedDict()
+        self._lock = threading.Lock()
+        
+    @staticmethod
+    def _chave(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+        
+    def get(self, token: str) -> Optional[Mapping]:
+        """Retorna as claims do token, se estiverem no cache e não expiradas"""
+        
+        chave = self._chave(token)
+        with self._lock:
+            item = self._itens.get(chave)
+            if item is None:
+                self.falhas += 1
+                return None
+            exp, _, claims = item
+            if exp <= time.time():
+                del self._itens[chave]
+                self.falhas += 1
+                return None
+            self._itens.move_to_end(chave)
+            self.acertos += 1
+            return claims
+        
+    def set(self, token: str, claims: dict, kid: Optional[str] = None) -> Mapping:
+        """Armazena as claims verificadas do token, com o kid da chave que o assinou"""
+        
+        claims = MappingProxyType(claims)
+        exp = claims.get("exp")
+        if not isinstance(exp, (int, float)) or self.tamanho_maximo <= 0:
+            return claims
+        
+        chave = self._chave(token)
+        with self._lock:
+            self._itens[chave] = (exp, kid, claims)
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.tamanho_maximo:
+                self._itens.popitem(last=False)
+        return claims
+    
+    def limpar(self):
+        """Remove todas as entradas, por exemplo na rotação de chaves"""
+        
+        with self._lock:
+            self._itens.clear()
+            
+    def remover_kids(self, kids: Collection[str]):
+        """Remove as entradas dos tokens assinados pelas chaves informadas"""
+        
+        with self._lock:
+            for chave in [c for c, (_, kid, _) in self._itens.items() if kid in kids]:
+                del self._itens[chave]
+            
+    def estatisticas(self) -> dict:
+        """Retorna o tamanho atual e os contadores de acertos e falhas"""
+        
+        with self._lock:
+            return {
+                "tamanho": len(self._itens),
+                "tamanho_maximo": self.tamanho_maximo,
+                "acertos": self.acertos,
+                "falhas": self.falhas,
+            }
+
+class CacheTTL:
+    """
+    Cache LRU com tempo de vida por entrada.
+    Usado para dados invalidados explicitamente na escrita,
+    com o TTL como limite para alterações feitas por outros processos.
+    """
+    
+    def __init__(self, tamanho_maximo: int, ttl: float):
+        self.tamanho_maximo = tamanho_maximo
+        self.ttl = ttl
+        self.acertos = 0
+        self.falhas = 0
+        self._itens: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+        
+    def get(self, chave: Hashable, padrao: Any = None) -> Any:
+        """Retorna o valor da chave, se estiver no cache e não expirado"""
+        
+        with self._lock:
+            item = self._itens.get(chave)
+            if item is None:
+                self.falhas += 1
+                return padrao
+            expira_em, valor = item
+            if expira_em <= time.monotonic():
+                del self._itens[chave]
+                self.falhas += 1
+                return padrao
+            self._itens.move_to_end(chave)
+            self.acertos += 1
+            return valor
+        
+    def set(self, chave: Hashable, valor: Any):
+        """Armazena o valor da chave"""
+        
+        if self.tamanho_maximo <= 0:
+            return
+        with self._lock:
+            self._itens[chave] = (time.monotonic() + self.ttl, valor)
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.tamanho_maximo:
+                self._itens.popitem(last=False)
+                
+    def invalidar(self, *chaves: Hashable):
+        """Remove as chaves informadas"""
+        
+        with self._lock:
+            for chave in chaves:
+                self._itens.pop(chave, None)
+    
+    def limpar(self):
+        """Remove todas as entradas"""
+        
+        with self._lock:
+            self._itens.clear()
+            
+    def estatisticas(self) -> dict:
+        """Retorna o tamanho atual e os contadores de acertos e falhas"""
+        
+        with self._lock:
+            return {
+                "tamanho": len(self._itens),
+                "tamanho_maximo": self.tamanho_maximo,
+                "acertos": self.acertos,
+                "falhas": self.falhas,
+            }
+
+class IndiceExpiravel:
+    """
+    Conjunto de chaves com data de expiração.
+    As chaves expiradas são removidas em ordem de expiração a cada acesso.
+    """
+    
+    def __init__(self):
+        self._itens: dict[Hashable, float] = {}
+        self._heap: list[tuple[float, Hashable]] = []
+        self._lock = threading.Lock()
+        
+    def _remover_expirados(self):
+        agora = time.time()
+        while self._heap and self._heap[0][0] <= agora:
+            expira_em, chave = heapq.heappop(self._heap)
+            # Ignora entradas antigas de chaves readicionadas
+            if self._itens.get(chave) == expira_em:
+                del self._itens[chave]
+                
+    def adicionar(self, chave: Hashable, expira_em: float):
+        """Adiciona a chave até o timestamp informado"""
+        
+        with self._lock:
+            if expira_em <= self._itens.get(chave, 0):
+                return
+            self._itens[chave] = expira_em
+            heapq.heappush(self._heap, (expira_em, chave))
+            self._remover_expirados()
+            
+    def __contains__(self, chave: Hashable) -> bool:
+        with self._lock:
+            self._remover_expirados()
+            return chave in self._itens
+        
+    def __len__(self) -> int:
+        with self._lock:
+            self._remover_expirados()
+            return len(self._itens)
+    
+    def limpar(self):
+        """Remove todas as chaves"""
+        
+        with self._lock:
+            self._itens.clear()
+            self._heap.clear()
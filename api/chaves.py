@@ -0,0 +1,223 @@
+"""Chaveiro de assinatura dos tokens"""
+
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Callable, NamedTuple, Optional
+
+import rsa
+from jose import jwk
+
+from api.config import (
+    ALGORITHM,
+    JWKS_CACHE_MAX_AGE,
+    JWT_KEY_ROTATION_DAYS,
+    JWT_KEYS_DIR,
+    REFRESH_TOKEN_EXPIRE_MINUTES,
+)
+
+# Algoritmos assimétricos suportados pelo chaveiro
+ALGORITHMS_ASSIMETRICOS = ("RS256", "RS384", "RS512")
+
+# Tamanho das chaves RSA geradas, em bits
+TAMANHO_CHAVE_RSA = 2048
+
+# Intervalo mínimo entre recargas do diretório ao receber um kid desconhecido
+INTERVALO_RECARGA = 5
+
+# Trava que serializa a manutenção das chaves entre os processos (workers).
+# Uma trava mais antiga que TRAVA_EXPIRACAO segundos é de um processo que
+# morreu durante a manutenção e pode ser descartada.
+ARQUIVO_TRAVA = ".manutencao.lock"
+TRAVA_EXPIRACAO = 30
+
+class Chave(NamedTuple):
+    kid: str
+    privada: str
+    publica: str
+    jwk: dict
+    criada_em: float
+
+class Chaveiro:
+    """
+    Mantém as chaves RSA de assinatura, uma por arquivo PEM no diretório
+    configurado, nomeado pelo kid. Uma chave nova só passa a assinar depois
+    de publicada no JWKS por tempo suficiente para expirar o cache dos
+    verificadores, e as antigas continuam publicadas enquanto houver tokens
+    assinados por elas ainda válidos.
+    """
+
+    def __init__(self, diretorio: str, algoritmo: str):
+        self.diretorio = diretorio
+        self.algoritmo = algoritmo
+        self._chaves: dict[str, Chave] = {}
+        self._ultima_recarga = 0.0
+        self._lock = threading.Lock()
+        self._ao_remover: list[Callable[[set[str]], None]] = []
+
+    @property
+    def assimetrico(self) -> bool:
+        return self.algoritmo in ALGORITHMS_ASSIMETRICOS
+
+    def carregar(self):
+        """Lê as chaves do diretório"""
+
+        chaves = {}
+        if os.path.isdir(self.diretorio):
+            for arquivo in os.listdir(self.diretorio):
+                kid, extensao = os.path.splitext(arquivo)
+                if extensao != ".pem":
+                    continue
+                caminho = os.path.join(self.diretorio, arquivo)
+                with open(caminho) as f:
+                    privada = f.read()
+                chave_publica = jwk.construct(privada, self.algoritmo).public_key()
+                publica_jwk = chave_publica.to_dict()
+                publica_jwk.update({"kid": kid, "use": "sig", "alg": self.algoritmo})
+                chaves[kid] = Chave(
+                    kid, 
+                    privada, 
+                    chave_publica.to_pem().decode(), 
+                    publica_jwk, 
+                    os.path.getmtime(caminho)
+                )
+        with self._lock:
+            removidas = set(self._chaves) - set(chaves)
+            self._chaves = chaves
+            self._ultima_recarga = time.monotonic()
+        if removidas:
+            for callback in self._ao_remover:
+                callback(removidas)
+
+    def ao_remover(self, callback: Callable[[set[str]], None]):
+        """
+        Registra uma função chamada com os kids que deixaram o chaveiro,
+        seja por aposentadoria neste processo ou por recarga do diretório
+        """
+
+        self._ao_remover.append(callback)
+
+    def rotacionar(self) -> str:
+        """Gera uma nova chave, que passa a assinar após o período de publicação"""
+
+        _, privada = rsa.newkeys(TAMANHO_CHAVE_RSA)
+        kid = uuid.uuid4().hex
+        os.makedirs(self.diretorio, exist_ok=True)
+        caminho = os.path.join(self.diretorio, f"{kid}.pem")
+        descritor = os.open(caminho, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(descritor, "wb") as f:
+            f.write(privada.save_pkcs1())
+        self.carregar()
+        return kid
+
+    def aposentar(self, kid: str):
+        """Remove uma chave; tokens assinados por ela deixam de ser aceitos"""
+
+        if kid == self.ativa.kid:
+            raise ValueError("A chave ativa não pode ser aposentada")
+        try:
+            os.remove(os.path.join(self.diretorio, f"{kid}.pem"))
+        except FileNotFoundError:
+            # Já aposentada por outro processo
+            pass
+        self.carregar()
+
+    @contextmanager
+    def _trava(self):
+        """Trava de arquivo (O_EXCL) no diretório das chaves, entre processos"""
+
+        os.makedirs(self.diretorio, exist_ok=True)
+        caminho = os.path.join(self.diretorio, ARQUIVO_TRAVA)
+        while True:
+            try:
+                os.close(os.open(caminho, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600))
+                break
+            except FileExistsError:
+                try:
+                    if time.time() - os.path.getmtime(caminho) > TRAVA_EXPIRACAO:
+                        os.remove(caminho)
+                        continue
+                except FileNotFoundError:
+                    continue
+                time.sleep(0.05)
+        try:
+            yield
+        finally:
+            os.remove(caminho)
+
+    def manter(self):
+        """
+        Carrega as chaves, gera a próxima quando a ativa passa da idade de
+        rotação e aposenta as que não assinam mais nenhum token válido.
+        Todos os workers executam a manutenção na inicialização, então ela é
+        serializada pela trava: cada worker relê o diretório depois de obtê-la
+        e reutiliza as chaves geradas pelos anteriores.
+        """
+
+        with self._trava():
+            self._manter()
+
+    def _manter(self):
+        self.carregar()
+        if not self._chaves:
+            self.rotacionar()
+            # A primeira chave assina imediatamente, não há verificadores com cache
+            return
+
+        agora = time.time()
+        mais_recente = max(self._chaves.values(), key=lambda c: c.criada_em)
+        if agora - mais_recente.criada_em > JWT_KEY_ROTATION_DAYS * 86400:
+            self.rotacionar()
+
+        ativa = self.ativa
+        validade_tokens = REFRESH_TOKEN_EXPIRE_MINUTES * 60  # pyright: ignore
+        for chave in list(self._chaves.values()):
+            sucessoras = [
+                c.criada_em + JWKS_CACHE_MAX_AGE
+                for c in self._chaves.values()
+                if c.criada_em > chave.criada_em
+            ]
+            # Substituída há mais tempo que a validade do token mais longo
+            if (
+                chave.kid != ativa.kid
+                and sucessoras
+                and agora - min(sucessoras) > validade_tokens
+            ):
+                self.aposentar(chave.kid)
+
+    @property
+    def ativa(self) -> Chave:
+        """
+        Chave usada para assinar: a mais recente já publicada há mais tempo
+        que o cache do JWKS ou, na falta dela, a mais antiga disponível.
+        """
+
+        chaves = sorted(self._chaves.values(), key=lambda c: c.criada_em)
+        if not chaves:
+            raise RuntimeError("Nenhuma chave de assinatura carregada")
+        limite = time.time() - JWKS_CACHE_MAX_AGE
+        publicadas = [c for c in chaves if c.criada_em <= limite]
+        return publicadas[-1] if publicadas else chaves[0]
+
+    def chave_verificacao(self, kid: Optional[str]) -> Optional[str]:
+        """
+        Retorna a chave pública (PEM) do kid. Um kid desconhecido pode ter sido
+        gerado por outro processo, então o diretório é relido no máximo
+        a cada INTERVALO_RECARGA segundos.
+        """
+
+        chave = self._chaves.get(kid)
+        if chave is None and time.monotonic() - self._ultima_recarga > INTERVALO_RECARGA:
+            self.carregar()
+            chave = self._chaves.get(kid)
+        return chave.publica if chave else None
+
+    def jwks(self) -> dict:
+        """Retorna as chaves públicas no formato JWK Set"""
+
+        chaves = sorted(self._chaves.values(), key=lambda c: c.criada_em)
+        return {"keys": [chave.jwk for chave in chaves]}
+
+chaveiro = Chaveiro(JWT_KEYS_DIR, ALGORITHM)  # pyright: ignore
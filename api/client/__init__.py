@@ -0,0 +1,11 @@
+"""Cliente Python da API, nas variantes síncrona e assíncrona"""
+
+from api.client._base import ErroAPI
+from api.client.assincrono import ClienteAPIAsync
+from api.client.sincrono import ClienteAPI
+
+__all__ = [
+    "ClienteAPI",
+    "ClienteAPIAsync",
+    "ErroAPI",
+]
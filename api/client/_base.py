@@ -0,0 +1,127 @@
+"""Estado compartilhado pelos clientes síncrono e assíncrono"""
+
+import base64
+import hashlib
+import json
+import time
+from typing import Iterable, Optional
+
+import httpx
+
+from api.cache import CacheTTL
+
+class ErroAPI(Exception):
+    """Erro retornado pela API"""
+    
+    def __init__(self, status_code: int, detalhe):
+        super().__init__(f"{status_code}: {detalhe}")
+        self.status_code = status_code
+        self.detalhe = detalhe
+        
+    @classmethod
+    def da_resposta(cls, resposta: httpx.Response) -> "ErroAPI":
+        try:
+            detalhe = resposta.json().get("detail")
+        except ValueError:
+            detalhe = resposta.text
+        return cls(resposta.status_code, detalhe)
+
+def expiracao_token(token: str) -> float:
+    """Lê o 'exp' do token sem verificar a assinatura, que cabe à API"""
+    
+    try:
+        payload = token.split(".")[1]
+        claims = json.loads(base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4)))
+        return float(claims["exp"])
+    except (IndexError, KeyError, TypeError, ValueError):
+        return 0.0
+
+def token_recusado(resposta: httpx.Response) -> bool:
+    """
+    Indica se a API recusou o próprio token (desafio 'invalid_token' da
+    RFC 6750), caso em que um novo token resolve. A falta de permissão
+    também responde 401, mas com 'insufficient_scope'.
+    """
+    
+    return 'error="invalid_token"' in resposta.headers.get("www-authenticate", "")
+
+class EstadoCliente:
+    """Tokens da sessão e cache local das decisões de autorização"""
+    
+    def __init__(
+        self,
+        nome_usuario: Optional[str],
+        senha: Optional[str],
+        margem_renovacao: float,
+        ttl_decisoes: float,
+        tamanho_cache_decisoes: int,
+    ):
+        self.nome_usuario = nome_usuario
+        self.senha = senha
+        self.margem_renovacao = margem_renovacao
+        self.access_token: Optional[str] = None
+        self.refresh_token: Optional[str] = None
+        self.expira_em = 0.0
+        self.decisoes = CacheTTL(tamanho_maximo=tamanho_cache_decisoes, ttl=ttl_decisoes)
+        
+    def armazenar_tokens(self, dados: dict):
+        self.access_token = dados["access_token"]
+        self.refresh_token = dados["refresh_token"]
+        self.expira_em = expiracao_token(self.access_token)
+        
+    def descartar_tokens(self):
+        self.access_token = self.refresh_token = None
+        self.expira_em = 0.0
+        
+    def precisa_renovar(self) -> bool:
+        """Indica se o access token está ausente ou prestes a expirar"""
+        
+        return self.access_token is None or time.time() >= self.expira_em - self.margem_renovacao
+    
+    def credenciais(self, nome_usuario: Optional[str], senha: Optional[str]) -> dict:
+        if nome_usuario is not None:
+            self.nome_usuario, self.senha = nome_usuario, senha
+        if self.nome_usuario is None or self.senha is None:
+            raise ValueError("Nome de usuário e senha não informados")
+        return {"username": self.nome_usuario, "password": self.senha}
+    
+    @staticmethod
+    def sujeito(token: Optional[str], nome_usuario: Optional[str]) -> tuple:
+        """Identifica o sujeito da decisão na chave do cache"""
+        
+        if token is not None:
+            return ("token", hashlib.sha256(token.encode()).digest())
+        return ("usuario", nome_usuario)
+        
+    def decisoes_em_cache(
+        self, 
+        sujeito: tuple, 
+        permissoes: Iterable[str]
+    ) -> tuple[dict[str, bool], list[str]]:
+        """Separa as decisões já em cache das permissões que faltam consultar"""
+        
+        conhecidas, faltantes = {}, []
+        for permissao in dict.fromkeys(permissoes):
+            decisao = self.decisoes.get((sujeito, permissao))
+            if decisao is None:
+                faltantes.append(permissao)
+            else:
+                conhecidas[permissao] = decisao
+        return conhecidas, faltantes
+    
+    def armazenar_decisoes(self, sujeito: tuple, resposta: dict) -> dict[str, bool]:
+        decisoes = {}
+        for decisao in resposta["decisoes"]:
+            decisoes[decisao["permissao"]] = decisao["permitido"]
+            self.decisoes.set((sujeito, decisao["permissao"]), decisao["permitido"])
+        return decisoes
+    
+    @staticmethod
+    def corpo_decisoes(
+        permissoes: list[str], 
+        token: Optional[str], 
+        nome_usuario: Optional[str]
+    ) -> dict:
+        if token is not None:
+            return {"token": token, "permissoes": permissoes}
+        return {"nome_usuario": nome_usuario, "permissoes": permissoes}
@@ -0,0 +1,178 @@
+"""Cliente assíncrono da API"""
+
+import asyncio
+from typing import Iterable, Optional
+
+import httpx
+
+from api.client._base import ErroAPI, EstadoCliente, token_recusado
+
+class ClienteAPIAsync:
+    """
+    Cliente da API com conexões reaproveitadas (keep-alive), renovação do
+    access token antes do 'exp' e cache local das decisões de autorização.
+    
+    Uso:
+        async with ClienteAPIAsync("http://localhost:8000", "admin", "admin") as cliente:
+            await cliente.get("/usuarios")
+            await cliente.pode("read:usuario", nome_usuario="bob")
+    """
+    
+    def __init__(
+        self,
+        base_url: str,
+        nome_usuario: Optional[str] = None,
+        senha: Optional[str] = None,
+        *,
+        margem_renovacao: float = 60,
+        ttl_decisoes: float = 30,
+        tamanho_cache_decisoes: int = 10000,
+        max_conexoes: int = 20,
+        timeout: float = 10.0,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self._estado = EstadoCliente(
+            nome_usuario, senha, margem_renovacao, ttl_decisoes, tamanho_cache_decisoes
+        )
+        self._lock = asyncio.Lock()
+        self._http = httpx.AsyncClient(
+            base_url=base_url,
+            timeout=timeout,
+            limits=httpx.Limits(
+                max_connections=max_conexoes, max_keepalive_connections=max_conexoes
+            ),
+            transport=transport,
+        )
+        
+    async def __aenter__(self) -> "ClienteAPIAsync":
+        return self
+    
+    async def __aexit__(self, *args):
+        await self.fechar()
+        
+    async def fechar(self):
+        """Fecha as conexões do pool"""
+        
+        await self._http.aclose()
+        
+    async def login(self, nome_usuario: Optional[str] = None, senha: Optional[str] = None):
+        """Autentica com usuário e senha, guardando-os para novos logins"""
+        
+        async with self._lock:
+            await self._login(nome_usuario, senha)
+            
+    async def _login(self, nome_usuario: Optional[str] = None, senha: Optional[str] = None):
+        resposta = await self._http.post("/token", data=self._estado.credenciais(nome_usuario, senha))
+        if resposta.status_code != 200:
+            raise ErroAPI.da_resposta(resposta)
+        self._estado.armazenar_tokens(resposta.json())
+        
+    async def _renovar(self):
+        """Rotaciona o refresh token ou, se ele não for mais aceito, refaz o login"""
+        
+        if self._estado.refresh_token is not None:
+            resposta = await self._http.post(
+                "/refresh-token", json={"refresh_token": self._estado.refresh_token}
+            )
+            if resposta.status_code == 200:
+                self._estado.armazenar_tokens(resposta.json())
+                return
+        self._estado.descartar_tokens()
+        await self._login()
+        
+    async def access_token(self) -> str:
+        """Access token válido, renovado quando está prestes a expirar"""
+        
+        async with self._lock:
+            if self._estado.precisa_renovar():
+                await self._renovar()
+            return self._estado.access_token  # pyright: ignore
+        
+    async def _renovar_recusado(self, token: str) -> str:
+        """Renova o token recusado pela API, se outra tarefa ainda não o fez"""
+        
+        async with self._lock:
+            if self._estado.access_token == token:
+                await self._renovar()
+            return self._estado.access_token  # pyright: ignore
+        
+    async def request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        """
+        Envia uma requisição autenticada. Se a API recusar o token, por
+        exemplo revogado antes do 'exp', renova e repete uma única vez.
+        """
+        
+        headers = kwargs.pop("headers", {})
+        token = await self.access_token()
+        resposta = await self._http.request(
+            method, url, headers={**headers, "Authorization": f"Bearer {token}"}, **kwargs
+        )
+        if token_recusado(resposta):
+            token = await self._renovar_recusado(token)
+            resposta = await self._http.request(
+                method, url, headers={**headers, "Authorization": f"Bearer {token}"}, **kwargs
+            )
+        return resposta
+    
+    async def get(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("GET", url, **kwargs)
+    
+    async def post(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("POST", url, **kwargs)
+    
+    async def patch(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("PATCH", url, **kwargs)
+    
+    async def delete(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("DELETE", url, **kwargs)
+    
+    async def decisoes(
+        self,
+        permissoes: Iterable[str],
+        *,
+        token: Optional[str] = None,
+        nome_usuario: Optional[str] = None,
+    ) -> dict[str, bool]:
+        """
+        Decide se o sujeito (token, nome de usuário ou, sem nenhum dos dois,
+        o próprio cliente) possui cada permissão. Apenas as decisões ausentes
+        do cache local são consultadas, em uma única chamada.
+        """
+        
+        if token is None and nome_usuario is None:
+            token = await self.access_token()
+        sujeito = self._estado.sujeito(token, nome_usuario)
+        decisoes, faltantes = self._estado.decisoes_em_cache(sujeito, permissoes)
+        if faltantes:
+            resposta = await self.post(
+                "/autorizacao/decisoes", 
+                json=self._estado.corpo_decisoes(faltantes, token, nome_usuario)
+            )
+            if resposta.status_code != 200:
+                raise ErroAPI.da_resposta(resposta)
+            decisoes.update(self._estado.armazenar_decisoes(sujeito, resposta.json()))
+        return decisoes
+    
+    async def pode(
+        self, 
+        permissao: str, 
+        *, 
+        token: Optional[str] = None, 
+        nome_usuario: Optional[str] = None
+    ) -> bool:
+        """Decide uma única permissão"""
+        
+        return (await self.decisoes([permissao], token=token, nome_usuario=nome_usuario))[permissao]
+    
+    async def introspectar(self, tokens: list[str]) -> list[dict]:
+        """Introspecção de tokens em lote"""
+        
+        resposta = await self.post("/token/introspeccao", json={"tokens": tokens})
+        if resposta.status_code != 200:
+            raise ErroAPI.da_resposta(resposta)
+        return resposta.json()["resultados"]
+    
+    def limpar_cache_decisoes(self):
+        """Descarta as decisões em cache"""
+        
+        self._estado.decisoes.limpar()
@@ -0,0 +1,179 @@
+"""Cliente síncrono da API"""
+
+import threading
+from typing import Iterable, Optional
+
+import httpx
+
+from api.client._base import ErroAPI, EstadoCliente, token_recusado
+
+class ClienteAPI:
+    """
+    Cliente da API com conexões reaproveitadas (keep-alive), renovação do
+    access token antes do 'exp' e cache local das decisões de autorização.
+    
+    Uso:
+        with ClienteAPI("http://localhost:8000", "admin", "admin") as cliente:
+            cliente.get("/usuarios")
+            cliente.pode("read:usuario", nome_usuario="bob")
+    """
+    
+    def __init__(
+        self,
+        base_url: str,
+        nome_usuario: Optional[str] = None,
+        senha: Optional[str] = None,
+        *,
+        margem_renovacao: float = 60,
+        ttl_decisoes: float = 30,
+        tamanho_cache_decisoes: int = 10000,
+        max_conexoes: int = 20,
+        timeout: float = 10.0,
+        transport: Optional[httpx.BaseTransport] = None,
+    ):
+        self._estado = EstadoCliente(
+            nome_usuario, senha, margem_renovacao, ttl_decisoes, tamanho_cache_decisoes
+        )
+        self._lock = threading.Lock()
+        self._http = httpx.Client(
+            base_url=base_url,
+            timeout=timeout,
+            limits=httpx.Limits(
+                max_connections=max_conexoes, max_keepalive_connections=max_conexoes
+            ),
+            transport=transport,
+        )
+        
+    def __enter__(self) -> "ClienteAPI":
+        return self
+    
+    def __exit__(self, *args):
+        self.fechar()
+        
+    def fechar(self):
+        """Fecha as conexões do pool"""
+        
+        self._http.close()
+        
+    def login(self, nome_usuario: Optional[str] = None, senha: Optional[str] = None):
+        """Autentica com usuário e senha, guardando-os para novos logins"""
+        
+        with self._lock:
+            self._login(nome_usuario, senha)
+            
+    def _login(self, nome_usuario: Optional[str] = None, senha: Optional[str] = None):
+        resposta = self._http.post("/token", data=self._estado.credenciais(nome_usuario, senha))
+        if resposta.status_code != 200:
+            raise ErroAPI.da_resposta(resposta)
+        self._estado.armazenar_tokens(resposta.json())
+        
+    def _renovar(self):
+        """Rotaciona o refresh token ou, se ele não for mais aceito, refaz o login"""
+        
+        if self._estado.refresh_token is not None:
+            resposta = self._http.post(
+                "/refresh-token", json={"refresh_token": self._estado.refresh_token}
+            )
+            if resposta.status_code == 200:
+                self._estado.armazenar_tokens(resposta.json())
+                return
+        self._estado.descartar_tokens()
+        self._login()
+        
+    @property
+    def access_token(self) -> str:
+        """Access token válido, renovado quando está prestes a expirar"""
+        
+        with self._lock:
+            if self._estado.precisa_renovar():
+                self._renovar()
+            return self._estado.access_token  # pyright: ignore
+        
+    def _renovar_recusado(self, token: str) -> str:
+        """Renova o token recusado pela API, se outra thread ainda não o fez"""
+        
+        with self._lock:
+            if self._estado.access_token == token:
+                self._renovar()
+            return self._estado.access_token  # pyright: ignore
+        
+    def request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        """
+        Envia uma requisição autenticada. Se a API recusar o token, por
+        exemplo revogado antes do 'exp', renova e repete uma única vez.
+        """
+        
+        headers = kwargs.pop("headers", {})
+        token = self.access_token
+        resposta = self._http.request(
+            method, url, headers={**headers, "Authorization": f"Bearer {token}"}, **kwargs
+        )
+        if token_recusado(resposta):
+            token = self._renovar_recusado(token)
+            resposta = self._http.request(
+                method, url, headers={**headers, "Authorization": f"Bearer {token}"}, **kwargs
+            )
+        return resposta
+    
+    def get(self, url: str, **kwargs) -> httpx.Response:
+        return self.request("GET", url, **kwargs)
+    
+    def post(self, url: str, **kwargs) -> httpx.Response:
+        return self.request("POST", url, **kwargs)
+    
+    def patch(self, url: str, **kwargs) -> httpx.Response:
+        return self.request("PATCH", url, **kwargs)
+    
+    def delete(self, url: str, **kwargs) -> httpx.Response:
+        return self.request("DELETE", url, **kwargs)
+    
+    def decisoes(
+        self,
+        permissoes: Iterable[str],
+        *,
+        token: Optional[str] = None,
+        nome_usuario: Optional[str] = None,
+    ) -> dict[str, bool]:
+        """
+        Decide se o sujeito (token, nome de usuário ou, sem nenhum dos dois,
+        o próprio cliente) possui cada permissão. Apenas as decisões ausentes
+        do cache local são consultadas, em uma única chamada.
+        """
+        
+        if token is None and nome_usuario is None:
+            token = self.access_token
+        sujeito = self._estado.sujeito(token, nome_usuario)
+        decisoes, faltantes = self._estado.decisoes_em_cache(sujeito, permissoes)
+        if faltantes:
+            resposta = self.post(
+                "/autorizacao/decisoes", 
+                json=self._estado.corpo_decisoes(faltantes, token, nome_usuario)
+            )
+            if resposta.status_code != 200:
+                raise ErroAPI.da_resposta(resposta)
+            decisoes.update(self._estado.armazenar_decisoes(sujeito, resposta.json()))
+        return decisoes
+    
+    def pode(
+        self, 
+        permissao: str, 
+        *, 
+        token: Optional[str] = None, 
+        nome_usuario: Optional[str] = None
+    ) -> bool:
+        """Decide uma única permissão"""
+        
+        return self.decisoes([permissao], token=token, nome_usuario=nome_usuario)[permissao]
+    
+    def introspectar(self, tokens: list[str]) -> list[dict]:
+        """Introspecção de tokens em lote"""
+        
+        resposta = self.post("/token/introspeccao", json={"tokens": tokens})
+        if resposta.status_code != 200:
+            raise ErroAPI.da_resposta(resposta)
+        return resposta.json()["resultados"]
+    
+    def limpar_cache_decisoes(self):
+        """Descarta as decisões em cache"""
+        
+        self._estado.decisoes.limpar()
@@ -2,11 +2,80 @@
 # mas para fins de exemplo, ficará aqui.
 
 SECRET_KEY = "b9483cc8a0bad1c2fe31e6d9d6a36c4a96ac23859a264b69a0badb4b32c538f8"
-ALGORITHM = "HS256"
+
+# Algoritmo de assinatura dos tokens. Com "RS256" os tokens são assinados pelo
+# chaveiro (com "kid") e verificáveis por terceiros via /.well-known/jwks.json;
+# com "HS256" são assinados com a SECRET_KEY.
+ALGORITHM = "RS256"
+
+# Implementação usada para assinar e verificar os tokens: "jose" (python-jose)
+# ou "pyjwt" (PyJWT, mais rápido; RS256 exige o pacote cryptography)
+JWT_BACKEND = "pyjwt"
+
+# Diretório das chaves privadas do chaveiro, um arquivo PEM por kid
+JWT_KEYS_DIR = "chaves"
+
+# Idade a partir da qual uma nova chave é gerada na inicialização
+JWT_KEY_ROTATION_DAYS = 30
+
+# Tempo de cache do JWKS (segundos). Uma chave nova só assina depois de
+# publicada por esse tempo, para que os verificadores já a conheçam.
+JWKS_CACHE_MAX_AGE = 300
+
 ACCESS_TOKEN_EXPIRE_MINUTES = 60
 REFRESH_TOKEN_EXPIRE_MINUTES = 600
 RESET_TOKEN_EXPIRE_MINUTES = 60
 
+# Número de processos para o hash de senhas (None usa a quantidade de núcleos)
+HASH_POOL_WORKERS = None
+
+# Quantidade máxima de tokens verificados mantidos em cache (0 desativa)
+TOKEN_CACHE_SIZE = 10000
+
+# Cache do status dos usuários (existência e ativo) consultado na validação
+# do token. O TTL limita a defasagem de alterações feitas em outros processos.
+USER_STATUS_CACHE_SIZE = 10000
+USER_STATUS_CACHE_TTL = 30
+
+# Emite as permissões do access token como bitset compacto ("pm" e "pv")
+# no lugar da lista de nomes. Renomear ou excluir uma permissão coberta
+# pelo bitset invalida as permissões do token, exigindo um novo login.
+TOKEN_PERMISSOES_COMPACTAS = False
+
+# Intervalo (segundos) entre as verificações de que o registro de permissões
+# em memória ainda corresponde ao banco, alterado por outros processos
+PERMISSOES_REGISTRO_TTL = 5
+
+# Perfil do SQLite aplicado a cada nova conexão
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": 5000,  # ms
+    "mmap_size": 268435456,  # 256 MB
+    "cache_size": -65536,  # Valores negativos são em KB (64 MB)
+    "temp_store": "MEMORY",
+}
+SQLITE_POOL_SIZE = 10
+SQLITE_MAX_OVERFLOW = 20
+
+# Tamanho padrão e máximo das páginas nas listagens
+PAGE_SIZE_DEFAULT = 100
+PAGE_SIZE_MAX = 1000
+
+# Quantidade de usuários inseridos por transação na importação em lote
+IMPORT_BATCH_SIZE = 1000
+
+# Quantidade máxima de permissões avaliadas por consulta de decisões
+DECISOES_MAX = 1000
+
+# Quantidade máxima de tokens por chamada de introspecção
+INTROSPECCAO_MAX = 1000
+
+# Intervalo (segundos) entre consultas de novos eventos no stream SSE
+# e entre os comentários de keep-alive enviados quando não há eventos
+EVENTOS_SSE_INTERVALO = 1.0
+EVENTOS_SSE_HEARTBEAT = 15.0
+
 # urls de exemplo para o frontend
 PWD_RESET_URL = "http://localhost:5173/resetsenha"
 
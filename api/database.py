@@ -1,21 +1,73 @@
 """Conexão com o banco de dados"""
 
+from sqlalchemy import event, inspect
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import create_async_engine
 from sqlmodel import Session, SQLModel , create_engine, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 from fastapi import Depends
 
+from api.config import SQLITE_MAX_OVERFLOW, SQLITE_POOL_SIZE, SQLITE_PRAGMAS
 from api.models.usuario import Grupo, Permissao, Usuario
 from api.security import criar_hash_senha
 
 sqlite_file_name = "auth.db"
 sqlite_url = f"sqlite:///{sqlite_file_name}"
+sqlite_async_url = f"sqlite+aiosqlite:///{sqlite_file_name}"
 
 connect_args = {"check_same_thread": False}
-engine = create_engine(sqlite_url, connect_args=connect_args)
+pool_args = {"pool_size": SQLITE_POOL_SIZE, "max_overflow": SQLITE_MAX_OVERFLOW}
+engine = create_engine(sqlite_url, connect_args=connect_args, **pool_args)
+async_engine = create_async_engine(sqlite_async_url, connect_args=connect_args, **pool_args)
+
+def aplicar_pragmas(dbapi_connection, connection_record):
+    """Aplica o perfil do SQLite (SQLITE_PRAGMAS) em cada nova conexão."""
+    
+    cursor = dbapi_connection.cursor()
+    for pragma, valor in SQLITE_PRAGMAS.items():
+        cursor.execute(f"PRAGMA {pragma}={valor}")
+    cursor.close()
+    
+event.listen(engine, "connect", aplicar_pragmas)
+event.listen(async_engine.sync_engine, "connect", aplicar_pragmas)
 
 def create_db_and_tables():
     """Cria as tabelas, se não existirem."""
     SQLModel.metadata.create_all(engine)
 
+# Colunas adicionadas depois da primeira versão: (tabela, coluna, definição)
+colunas_adicionadas = [
+    ("usuario", "token_version", "INTEGER NOT NULL DEFAULT 0"),
+    ("grupo", "grupo_pai_id", "INTEGER REFERENCES grupo (id)"),
+]
+
+def migrar_esquema():
+    """
+    Atualiza bancos criados por versões anteriores,
+    adicionando as colunas e os índices que estiverem faltando.
+    """
+    
+    with engine.begin() as conn:
+        inspetor = inspect(conn)
+        for tabela, coluna, definicao in colunas_adicionadas:
+            colunas = {c["name"] for c in inspetor.get_columns(tabela)}
+            if coluna not in colunas:
+                conn.exec_driver_sql(f"ALTER TABLE {tabela} ADD COLUMN {coluna} {definicao}")
+    
+    inspetor = inspect(engine)
+    for tabela in SQLModel.metadata.sorted_tables:
+        existentes = {indice["name"] for indice in inspetor.get_indexes(tabela.name)}
+        for indice in tabela.indexes:
+            if indice.name in existentes:
+                continue
+            try:
+                with engine.begin() as conn:
+                    indice.create(conn)
+                print(f"Índice {indice.name} criado com sucesso!")
+            except IntegrityError:
+                # Ex.: nomes de usuário duplicados impedem o índice único
+                print(f"Não foi possível criar o índice {indice.name}: existem valores duplicados")
+
 def get_session():
     """Cria uma sessão com o banco de dados."""
     with Session(engine) as session:
@@ -23,6 +75,13 @@ def get_session():
         
 SessionDep = Depends(get_session)
 
+async def get_async_session():
+    """Cria uma sessão assíncrona com o banco de dados."""
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+        yield session
+        
+AsyncSessionDep = Depends(get_async_session)
+
 lista_permissoes = [
     "all:all",
     "add:permissao",
@@ -74,7 +133,10 @@ def create_default_groups_and_permissions():
     print("Grupos e permissões padrão criados com sucesso!")
         
 def create_user_admin():
-    """Cria o usuário admin padrão."""
+    """
+    Cria o usuário admin padrão, já com as permissões efetivas.
+    Depende da hierarquia de grupos reconstruída.
+    """
     
     with Session(engine) as session:
         admin_grupo = session.exec(select(Grupo).where(Grupo.nome_grupo == "admins")).first()
@@ -94,5 +156,10 @@ def create_user_admin():
             ativo=True
         )
         session.add(admin)
+        session.flush()
+        
+        # Importado aqui: o serviço de permissões depende deste módulo
+        from api.services.permissao import atualizar_efetivas_usuario_grupo
+        atualizar_efetivas_usuario_grupo(session, adicionados=[(admin.id, admin_grupo.id)])
         session.commit()
         print("Usuário admin criado com sucesso!")
\ No newline at end of file
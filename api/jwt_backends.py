@@ -0,0 +1,101 @@
+"""Implementações de assinatura e verificação de JWT"""
+
+from functools import lru_cache
+from typing import Mapping, Optional, Protocol, Union
+
+from jose import JWTError
+
+from api.config import JWT_BACKEND
+
+Chave = Union[str, bytes]
+
+class BackendJWT(Protocol):
+    """
+    Interface usada por api.auth para assinar e verificar tokens.
+    A chave é o segredo (HS*) ou um PEM (RS*); todas as implementações
+    sinalizam tokens inválidos com jose.JWTError.
+    """
+
+    def codificar(
+        self,
+        claims: dict,
+        chave: Chave,
+        algoritmo: str,
+        headers: Optional[dict] = None
+    ) -> str: ...
+
+    def decodificar(self, token: str, chave: Chave, algoritmos: list[str]) -> dict: ...
+
+    def cabecalho(self, token: str) -> Mapping: ...
+
+class BackendJose:
+    """Backend baseado no python-jose"""
+
+    def __init__(self):
+        from jose import jwk, jwt
+
+        self._jwt = jwt
+        # Evita reconstruir a chave (e reinterpretar o PEM) a cada token
+        self._chave = lru_cache(maxsize=32)(jwk.construct)
+
+    def codificar(self, claims, chave, algoritmo, headers=None):
+        return self._jwt.encode(
+            claims, self._chave(chave, algoritmo), algorithm=algoritmo, headers=headers
+        )
+
+    def decodificar(self, token, chave, algoritmos):
+        return self._jwt.decode(token, self._chave(chave, algoritmos[0]), algorithms=algoritmos)
+
+    def cabecalho(self, token):
+        return self._jwt.get_unverified_header(token)
+
+class BackendPyJWT:
+    """
+    Backend baseado no PyJWT, mais rápido que o python-jose.
+    Os algoritmos RS* exigem o pacote cryptography.
+    """
+
+    def __init__(self):
+        import jwt
+        from jwt.algorithms import get_default_algorithms
+
+        self._jwt = jwt
+        self._erro = jwt.PyJWTError
+        algoritmos = get_default_algorithms()
+        self._chave = lru_cache(maxsize=32)(
+            lambda chave, algoritmo: algoritmos[algoritmo].prepare_key(chave)
+        )
+
+    def codificar(self, claims, chave, algoritmo, headers=None):
+        return self._jwt.encode(
+            claims, self._chave(chave, algoritmo), algorithm=algoritmo, headers=headers
+        )
+
+    def decodificar(self, token, chave, algoritmos):
+        try:
+            return self._jwt.decode(
+                token, self._chave(chave, algoritmos[0]), algorithms=algoritmos
+            )
+        except self._erro as e:
+            raise JWTError(str(e)) from e
+
+    def cabecalho(self, token):
+        try:
+            return self._jwt.get_unverified_header(token)
+        except self._erro as e:
+            raise JWTError(str(e)) from e
+
+BACKENDS = {
+    "jose": BackendJose,
+    "pyjwt": BackendPyJWT,
+}
+
+def criar_backend(nome: str = JWT_BACKEND) -> BackendJWT:  # pyright: ignore
+    """Instancia o backend configurado"""
+
+    try:
+        return BACKENDS[nome]()
+    except KeyError:
+        raise ValueError(f"Backend JWT desconhecido: {nome}") from None
+
+backend_jwt = criar_backend()
@@ -1,11 +1,27 @@
 from sqlmodel import SQLModel
-from .usuario import Usuario, UsuarioGrupoLink, Grupo, GrupoPermissaoLink, Permissao
+from .usuario import (
+    Usuario, 
+    UsuarioGrupoLink, 
+    Grupo, 
+    GrupoHierarquia,
+    GrupoPermissaoLink, 
+    Permissao, 
+    UsuarioPermissaoEfetiva,
+    VersaoPermissoes
+)
+from .token import RotacaoRefreshToken
+from .evento import EventoPermissao
 
 __all__ = [
     "SQLModel",
     "Usuario",
     "UsuarioGrupoLink",
     "Grupo",
+    "GrupoHierarquia",
     "GrupoPermissaoLink",
-    "Permissao"
+    "Permissao",
+    "UsuarioPermissaoEfetiva",
+    "VersaoPermissoes",
+    "RotacaoRefreshToken",
+    "EventoPermissao"
 ]
\ No newline at end of file
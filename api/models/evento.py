@@ -0,0 +1,27 @@
+"""Modelos de dados do registro de alterações de permissões"""
+
+from datetime import datetime
+from typing import Optional
+
+from dateutil import tz
+from sqlalchemy import JSON, Column
+from sqlmodel import Field, SQLModel
+
+class EventoPermissao(SQLModel, table=True):
+    """
+    Registro append-only das alterações que afetam as permissões dos usuários.
+    O seq é monotônico (AUTOINCREMENT), permitindo que os consumidores
+    retomem a leitura a partir do último evento processado.
+    """
+    
+    __table_args__ = {"sqlite_autoincrement": True}
+    
+    seq: Optional[int] = Field(default=None, primary_key=True)
+    tipo: str = Field(nullable=False)
+    usuarios: list[str] = Field(default_factory=list, sa_column=Column(JSON, nullable=False))
+    grupo_id: Optional[int] = Field(default=None)
+    permissao_id: Optional[int] = Field(default=None)
+    criado_em: datetime = Field(
+        default_factory=lambda: datetime.now(tz=tz.tzutc()).replace(tzinfo=None), 
+        nullable=False
+    )
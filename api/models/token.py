@@ -0,0 +1,13 @@
+"""Modelos de dados relacionados aos tokens"""
+
+from datetime import datetime
+from sqlmodel import Field, SQLModel
+
+class RotacaoRefreshToken(SQLModel, table=True):
+    """Representa um refresh token emitido, usado na rotação e detecção de reuso"""
+    
+    jti: str = Field(primary_key=True)
+    familia: str = Field(index=True, nullable=False)
+    nome_usuario: str = Field(nullable=False)
+    expira_em: datetime = Field(index=True, nullable=False)
+    consumido: bool = Field(default=False)
@@ -9,18 +9,23 @@ class UsuarioGrupoLink(SQLModel, table=True):
     """Representa o modelo de ligação entre usuário e grupo"""
     
     usuario_id: int = Field(default = None, foreign_key = "usuario.id", primary_key = True)
-    grupo_id: int = Field(default = None, foreign_key = "grupo.id", primary_key = True)
+    grupo_id: int = Field(default = None, foreign_key = "grupo.id", primary_key = True, index = True)
 
 class Usuario(SQLModel, table=True):
     """Representa o modelo do usuário"""
     
     id: Optional[int] = Field(default=None, primary_key=True)
-    nome_usuario: str = Field(nullable=False)
+    nome_usuario: str = Field(unique=True, index=True, nullable=False)
     nome_pessoa: str = Field(nullable=False)
     senha: HashedPassword
     email: str = Field(unique=True, nullable=False)
     avatar: Optional[str] = None
     ativo: bool = Field(default=True)
+    token_version: int = Field(
+        default=0, 
+        nullable=False, 
+        sa_column_kwargs={"server_default": "0"}
+    )  # Incrementado para revogar todos os tokens do usuário
     grupos: list["Grupo"] = Relationship(
         back_populates = "usuarios",
         link_model = UsuarioGrupoLink,
@@ -38,13 +43,25 @@ class GrupoPermissaoLink(SQLModel, table=True):
     """Representa o modelo de ligação entre grupo e permissão"""
     
     grupo_id: int = Field(default = None, foreign_key = "grupo.id", primary_key = True)
-    permissao_id: int = Field(default = None, foreign_key = "permissao.id", primary_key = True)
+    permissao_id: int = Field(default = None, foreign_key = "permissao.id", primary_key = True, index = True)
+
+class GrupoHierarquia(SQLModel, table=True):
+    """
+    Representa a tabela de fechamento (closure table) da hierarquia de grupos.
+    Cada grupo possui uma linha para si mesmo (profundidade 0) e uma para cada
+    ancestral. Os membros de um grupo herdam as permissões de seus ancestrais.
+    """
+    
+    ancestral_id: int = Field(foreign_key = "grupo.id", primary_key = True)
+    descendente_id: int = Field(foreign_key = "grupo.id", primary_key = True, index = True)
+    profundidade: int = Field(nullable = False)
 
 class Grupo(SQLModel, table=True):
     """Representa o modelo do grupo"""
 
     id: Optional[int] = Field(default=None, primary_key=True)
     nome_grupo: str = Field(unique=True, nullable=False)
+    grupo_pai_id: Optional[int] = Field(default=None, foreign_key="grupo.id", index=True)
     permissoes: list["Permissao"] = Relationship(
         back_populates = "grupos", link_model = GrupoPermissaoLink
     )
@@ -59,4 +76,28 @@ class Permissao(SQLModel, table=True):
     nome_permissao: str = Field(unique=True, nullable=False)
     grupos: list[Grupo] = Relationship(
         back_populates = "permissoes", link_model = GrupoPermissaoLink
-    )
\ No newline at end of file
+    )
+    
+class VersaoPermissoes(SQLModel, table=True):
+    """
+    Contador incrementado a cada criação, renomeação ou exclusão de permissão.
+    Cada processo o consulta para saber se seu registro em memória está defasado.
+    """
+    
+    __tablename__ = "versao_permissoes"
+    
+    id: int = Field(default = 1, primary_key = True)
+    versao: int = Field(default = 0, nullable = False)
+    
+class UsuarioPermissaoEfetiva(SQLModel, table=True):
+    """
+    Representa as permissões efetivas de cada usuário, materializadas
+    a partir dos grupos. 'contagem' é o número de grupos do usuário
+    que concedem a permissão.
+    """
+    
+    __tablename__ = "usuario_permissao_efetiva"
+    
+    usuario_id: int = Field(foreign_key = "usuario.id", primary_key = True)
+    permissao_id: int = Field(foreign_key = "permissao.id", primary_key = True, index = True)
+    contagem: int = Field(default = 1, nullable = False)
@@ -0,0 +1,64 @@
+"""Paginação por cursor (keyset) das listagens"""
+
+import base64
+from typing import Optional, Sequence, TypeVar
+
+from fastapi import HTTPException, Query, Response, status
+
+from api.config import PAGE_SIZE_DEFAULT, PAGE_SIZE_MAX
+
+T = TypeVar("T")
+
+def codificar_cursor(id: int) -> str:
+    """Codifica o último id da página em um cursor opaco"""
+    
+    return base64.urlsafe_b64encode(f"id:{id}".encode()).rstrip(b"=").decode()
+
+def decodificar_cursor(cursor: str) -> int:
+    """Decodifica um cursor gerado por codificar_cursor"""
+    
+    try:
+        texto = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        prefixo, id = texto.split(":")
+        if prefixo != "id":
+            raise ValueError
+        return int(id)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, 
+            detail="Cursor inválido"
+        )
+
+class Paginacao:
+    """
+    Dependência de paginação por chave primária.
+    Aceita 'after_id' ou o cursor opaco 'cursor' e devolve o cursor
+    da próxima página no cabeçalho X-Next-Cursor.
+    """
+    
+    def __init__(
+        self,
+        response: Response,
+        after_id: Optional[int] = Query(None, ge=0),
+        cursor: Optional[str] = None,
+        limit: int = Query(PAGE_SIZE_DEFAULT, ge=1),
+    ):
+        self.response = response
+        self.after_id = decodificar_cursor(cursor) if cursor else after_id
+        self.limit = min(limit, PAGE_SIZE_MAX)
+        
+    def aplicar(self, query, coluna_id):
+        """Aplica o filtro, a ordenação e o limite na consulta"""
+        
+        if self.after_id is not None:
+            query = query.where(coluna_id > self.after_id)
+        # Busca um item a mais para saber se existe próxima página
+        return query.order_by(coluna_id).limit(self.limit + 1)
+    
+    def pagina(self, itens: Sequence[T]) -> Sequence[T]:
+        """Retorna os itens da página e define o cursor da próxima"""
+        
+        if len(itens) > self.limit:
+            itens = itens[:self.limit]
+            self.response.headers["X-Next-Cursor"] = codificar_cursor(itens[-1].id)
+        return itens
@@ -1,6 +1,10 @@
+import hashlib
+import json
 from datetime import timedelta
+from typing import Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordRequestForm
 
 from api.auth import (
@@ -8,15 +12,24 @@ from api.auth import (
     RefreshToken,
     Usuario,
     criar_access_token,
-    criar_refresh_token,
+    emitir_refresh_token,
+    rotacionar_refresh_token,
+    claims_permissoes,
+    introspectar_tokens,
+    ValidarPermissoes,
     autenticar_usuario,
-    valida_token,
     buscar_usuario_atual_ativo,
 )
 
-from api.config import ACCESS_TOKEN_EXPIRE_MINUTES, REFRESH_TOKEN_EXPIRE_MINUTES
+from api.chaves import chaveiro
+from api.config import ACCESS_TOKEN_EXPIRE_MINUTES, JWKS_CACHE_MAX_AGE
 
-from api.serializers.usuario import UsuarioResponse
+from api.services.usuario import get_usuario_grupos_permissoes
+from api.serializers.usuario import (
+    IntrospeccaoRequest, 
+    IntrospeccaoResponse, 
+    UsuarioResponse
+)
 
 router = APIRouter()
 
@@ -41,6 +54,34 @@ async def validar_token_usuario_autenticado(
         )
 
 
+def _emitir_tokens(
+    usuario: Usuario, 
+    grupos: tuple[str, ...], 
+    permissoes: tuple[str, ...],
+    familia: Optional[str] = None
+) -> dict:
+    """
+    Emite o access token e o refresh token, registrando o refresh token no banco.
+    O token_version vem do usuário recém-carregado, não do status em cache,
+    que pode estar defasado em relação a outro processo.
+    """
+    
+    access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES) # pyright: ignore
+    access_token = criar_access_token(
+        data={
+            "sub": usuario.nome_usuario, 
+            "grupos": grupos,
+            **claims_permissoes(permissoes),
+            "fresh": True,
+            "tv": usuario.token_version,
+        },
+        expires_delta=access_token_expires
+    )
+    refresh_token = emitir_refresh_token(
+        usuario.nome_usuario, familia=familia, token_version=usuario.token_version
+    )
+    return {"access_token": access_token, "refresh_token": refresh_token, "token_type": "bearer"}
+
 @router.post(
     "/token", 
     response_model=Token
@@ -50,7 +91,7 @@ async def login_de_acesso(
 ):
     """Realiza o login de acesso"""
     
-    usuario_auth = autenticar_usuario(form_data.username, form_data.password)
+    usuario_auth = await autenticar_usuario(form_data.username, form_data.password)
     
     if usuario_auth:
         usuario = usuario_auth[0]
@@ -64,23 +105,8 @@ async def login_de_acesso(
                 headers={"WWW-Authenticate": "Bearer"},
             )
 
-        access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES) # pyright: ignore
-        access_token = criar_access_token(
-            data={
-                "sub": usuario.nome_usuario, 
-                "grupos": grupos,
-                "permissoes": permissoes,
-                "fresh": True
-                },
-            expires_delta=access_token_expires
-        )
-        
-        refresh_token_expires = timedelta(minutes=REFRESH_TOKEN_EXPIRE_MINUTES) # pyright: ignore
-        refresh_token = criar_refresh_token(
-            data={"sub": usuario.nome_usuario}, expires_delta=refresh_token_expires
-        )
-
-        return {"access_token": access_token, "refresh_token": refresh_token, "token_type": "bearer"}
+        # A emissão grava o refresh token no banco, fora do event loop
+        return await run_in_threadpool(_emitir_tokens, usuario, grupos, permissoes)
     else:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -92,25 +118,48 @@ async def login_de_acesso(
     "/refresh-token", 
     response_model=Token
 )
-async def refresh_token(
+def refresh_token(
     form_data: RefreshToken
 ):
     """Atualiza o token de acesso"""
     
-    usuario = valida_token(token = form_data.refresh_token)
+    token_data, familia = rotacionar_refresh_token(form_data.refresh_token)
     
-    access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES) # pyright: ignore
-    access_token = criar_access_token(
-        data={"sub": usuario.nome_usuario, "fresh": True}, expires_delta=access_token_expires
-    )
+    # O novo access token carrega os grupos e permissões atuais, como no login
+    usuario_grupos_permissoes = get_usuario_grupos_permissoes(token_data.nome_usuario)
+    if not usuario_grupos_permissoes:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Nome de usuário ou senha inválidos",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    usuario, grupos, permissoes = usuario_grupos_permissoes
     
-    refresh_token_expires = timedelta(minutes=REFRESH_TOKEN_EXPIRE_MINUTES) # pyright: ignore
-    refresh_token = criar_refresh_token(
-        data={"sub": usuario.nome_usuario}, expires_delta=refresh_token_expires
-    )
+    return _emitir_tokens(usuario, grupos, permissoes, familia=familia)
+
+@router.post(
+    "/token/introspeccao",
+    response_model=IntrospeccaoResponse,
+    response_model_exclude_none=True,
+    dependencies=[Depends(ValidarPermissoes(["read:usuario"]))]
+)
+def introspeccao_tokens(
+    consulta: IntrospeccaoRequest
+):
+    """Informa se cada token está ativo e, nesse caso, suas claims (RFC 7662)"""
+    
+    return {"resultados": introspectar_tokens(consulta.tokens)}
+
+@router.get("/.well-known/jwks.json")
+async def jwks(request: Request):
+    """Publica as chaves públicas para a verificação local dos tokens"""
     
-    return {
-        "access_token": access_token, 
-        "refresh_token": refresh_token, 
-        "token_type": "bearer"
-    }
\ No newline at end of file
+    corpo = json.dumps(chaveiro.jwks(), separators=(",", ":"))
+    etag = '"' + hashlib.sha256(corpo.encode()).hexdigest()[:32] + '"'
+    headers = {
+        "Cache-Control": f"public, max-age={JWKS_CACHE_MAX_AGE}",
+        "ETag": etag,
+    }
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=corpo, media_type="application/json", headers=headers)
@@ -0,0 +1,64 @@
+from fastapi import APIRouter, Request
+from jose import JWTError
+
+from api.auth import IdentidadeRequisicao, ValidarPermissoes
+from api.serializers.usuario import Decisao, DecisaoRequest, DecisaoResponse
+from api.services.permissao import registro_permissoes
+from api.services.usuario import get_permissoes, get_status_usuario
+
+router = APIRouter()
+
+# Consultar as permissões de outro usuário pelo nome exige acesso de leitura a usuários
+validar_consulta_por_nome = ValidarPermissoes(["read:usuario"])
+
+@router.post(
+    "/decisoes",
+    response_model=DecisaoResponse
+)
+def consultar_decisoes(
+    *,
+    consulta: DecisaoRequest,
+    request: Request
+) -> DecisaoResponse:
+    """
+    Decide, em uma única chamada, se o usuário possui cada uma das permissões
+    informadas. Com token, as permissões vêm do próprio token; com nome de
+    usuário, das permissões efetivas do usuário.
+    """
+
+    registro_permissoes.garantir_carregado()
+
+    nome_usuario = consulta.nome_usuario
+    ativo = False
+    mascara = 0
+
+    if consulta.token is not None:
+        identidade = IdentidadeRequisicao(consulta.token)
+        try:
+            nome_usuario = identidade.payload.get("sub")
+            ativo = (
+                identidade.payload.get("scope") != "refresh_token"
+                and not identidade.revogado
+                and identidade.status.ativo
+            )
+        except JWTError:
+            nome_usuario = None
+        if ativo:
+            mascara = identidade.mascara_permissoes
+    else:
+        validar_consulta_por_nome(token=None, request=request)
+        ativo = get_status_usuario(nome_usuario).ativo
+        if ativo:
+            mascara = registro_permissoes.compilar(get_permissoes(nome_usuario), estrito=False)
+
+    nomes = [str(permissao) for permissao in consulta.permissoes]
+    requisitos = dict(zip(nomes, registro_permissoes.compilar_requisitos(nomes)))
+
+    return DecisaoResponse(
+        nome_usuario=nome_usuario,
+        ativo=ativo,
+        decisoes=[
+            Decisao(permissao=nome, permitido=ativo and bool(mascara & requisitos[nome]))
+            for nome in nomes
+        ],
+    )
@@ -0,0 +1,83 @@
+import asyncio
+import time
+from typing import AsyncIterator, List, Optional
+
+from fastapi import APIRouter, Depends, Header, Query, Request
+from fastapi.responses import StreamingResponse
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from api.auth import ValidarPermissoes
+from api.config import (
+    EVENTOS_SSE_HEARTBEAT, 
+    EVENTOS_SSE_INTERVALO, 
+    PAGE_SIZE_DEFAULT, 
+    PAGE_SIZE_MAX
+)
+from api.database import AsyncSessionDep, async_engine
+from api.serializers.usuario import EventoResponse
+from api.services.evento import listar_eventos, ultimo_seq
+
+router = APIRouter()
+
+@router.get(
+    "",
+    response_model=List[EventoResponse],
+    dependencies=[Depends(ValidarPermissoes(["read:usuario"]))]
+)
+async def listar_eventos_desde(
+    *,
+    since: int = Query(0, ge=0),
+    limit: int = Query(PAGE_SIZE_DEFAULT, ge=1),
+    session: AsyncSession = AsyncSessionDep
+):
+    """Lista os eventos de alteração de permissões com seq maior que 'since'"""
+    
+    return await listar_eventos(session, since, min(limit, PAGE_SIZE_MAX))
+
+async def _stream_eventos(request: Request, desde: int) -> AsyncIterator[str]:
+    """Envia os novos eventos no formato SSE, consultando-os periodicamente"""
+    
+    ultimo_envio = time.monotonic()
+    while not await request.is_disconnected():
+        async with AsyncSession(async_engine) as session:
+            eventos = await listar_eventos(session, desde, PAGE_SIZE_MAX)
+        for evento in eventos:
+            dados = EventoResponse.model_validate(evento, from_attributes=True).model_dump_json()
+            yield f"id: {evento.seq}\nevent: {evento.tipo}\ndata: {dados}\n\n"
+            desde = evento.seq
+        if eventos:
+            ultimo_envio = time.monotonic()
+            # Página cheia: ainda pode haver eventos pendentes
+            if len(eventos) == PAGE_SIZE_MAX:
+                continue
+        elif time.monotonic() - ultimo_envio >= EVENTOS_SSE_HEARTBEAT:
+            yield ": keep-alive\n\n"
+            ultimo_envio = time.monotonic()
+        await asyncio.sleep(EVENTOS_SSE_INTERVALO)
+
+@router.get(
+    "/stream",
+    dependencies=[Depends(ValidarPermissoes(["read:usuario"]))]
+)
+async def stream_eventos(
+    *,
+    request: Request,
+    since: Optional[int] = Query(None, ge=0),
+    last_event_id: Optional[int] = Header(None),
+):
+    """
+    Stream SSE dos eventos de alteração de permissões. Reconexões retomam
+    a partir do cabeçalho Last-Event-ID; sem ele, a partir de 'since' ou,
+    sem nenhum dos dois, apenas os eventos novos.
+    """
+    
+    desde = last_event_id if last_event_id is not None else since
+    if desde is None:
+        async with AsyncSession(async_engine) as session:
+            desde = await ultimo_seq(session)
+    
+    return StreamingResponse(
+        _stream_eventos(request, desde),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -2,12 +2,34 @@ from typing import List
 
 from fastapi import APIRouter, Depends
 from fastapi.exceptions import HTTPException
+from sqlalchemy.orm import selectinload
 from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from api.auth import ValidarPermissoes
-from api.database import SessionDep
-from api.models.usuario import Grupo, Permissao, UsuarioGrupoLink
-from api.serializers.usuario import GrupoResponse, GrupoRequest
+from api.database import AsyncSessionDep, SessionDep
+from api.models.usuario import Grupo, GrupoPermissaoLink, Permissao, UsuarioGrupoLink
+from api.paginacao import Paginacao
+from api.serializers.usuario import (
+    GrupoResponse, 
+    GrupoRequest, 
+    GrupoPermissaoLoteRequest, 
+    LoteResponse
+)
+from api.services.lote import (
+    ids_existentes, 
+    inserir_vinculos, 
+    remover_vinculos, 
+    vinculos_existentes
+)
+from api.services.evento import registrar_evento, usuarios_dos_grupos
+from api.services.grupo import (
+    HierarquiaInvalida, 
+    incluir_na_hierarquia, 
+    mover_grupo, 
+    remover_da_hierarquia
+)
+from api.services.permissao import atualizar_efetivas_grupo_permissao
 
 router = APIRouter()
 
@@ -18,21 +40,28 @@ router = APIRouter()
 )
 async def listar_grupos(
     *, 
-    session: Session = SessionDep
+    session: AsyncSession = AsyncSessionDep,
+    paginacao: Paginacao = Depends()
 ):
-    """Lista todos os grupos"""
+    """Lista os grupos, paginados por id"""
     
     # Exclui o grupo "admins" da lista de grupos
     # para evitar que usuários comuns vejam este grupo
     # e suas permissões.
     
-    grupos = session.exec(select(Grupo).where(Grupo.nome_grupo != 'admins')).all()
+    query = (
+        select(Grupo)
+        .where(Grupo.nome_grupo != 'admins')
+        .options(selectinload(Grupo.permissoes))
+    )
+    grupos = paginacao.pagina((await session.exec(paginacao.aplicar(query, Grupo.id))).all())
     response = []
     for grupo in grupos:
         response.append(
             GrupoResponse(
                 id = grupo.id,
                 nome_grupo = grupo.nome_grupo,
+                grupo_pai_id = grupo.grupo_pai_id,
                 permissoes = [{"id": permissao.id, "nome_permissao": permissao.nome_permissao} for permissao in grupo.permissoes]
             )
         )
@@ -44,7 +73,7 @@ async def listar_grupos(
     status_code=201,
     dependencies=[Depends(ValidarPermissoes(["add:grupo"]))]
 )
-async def criar_grupo(
+def criar_grupo(
     *, 
     grupo: GrupoRequest, 
     session: Session = SessionDep
@@ -56,17 +85,72 @@ async def criar_grupo(
     
     permissoes = session.exec(select(Permissao).where(Permissao.id.in_(grupo.permissoes_id))).all()
     
-    db_grupo = Grupo(nome_grupo=grupo.nome_grupo, permissoes=permissoes)
+    db_grupo = Grupo(nome_grupo=grupo.nome_grupo, grupo_pai_id=grupo.grupo_pai_id, permissoes=permissoes)
     session.add(db_grupo)
+    session.flush()
+    try:
+        incluir_na_hierarquia(session, db_grupo)
+    except HierarquiaInvalida as e:
+        session.rollback()
+        raise HTTPException(status_code=409, detail=str(e))
     session.commit()
     session.refresh(db_grupo)
     
     return GrupoResponse(
         id = db_grupo.id,
         nome_grupo = db_grupo.nome_grupo,
+        grupo_pai_id = db_grupo.grupo_pai_id,
         permissoes = [{"id": permissao.id, "nome_permissao": permissao.nome_permissao} for permissao in db_grupo.permissoes],
     )
     
+@router.post(
+    "/permissoes/lote",
+    response_model=LoteResponse,
+    dependencies=[Depends(ValidarPermissoes(["update:grupo"]))]
+)
+def atualizar_permissoes_grupos_em_lote(
+    *, 
+    patch_data: GrupoPermissaoLoteRequest, 
+    session: Session = SessionDep
+) -> LoteResponse:
+    """Adiciona e remove permissões de grupos em lote, em uma única transação"""
+    
+    adicionar = {(v.grupo_id, v.permissao_id) for v in patch_data.adicionar}
+    remover = {(v.grupo_id, v.permissao_id) for v in patch_data.remover}
+    
+    grupos_validos = ids_existentes(session, Grupo.id, (g for g, _ in adicionar | remover))
+    permissoes_validas = ids_existentes(session, Permissao.id, (p for _, p in adicionar | remover))
+    adicionar_validos = [
+        (g, p) for g, p in adicionar if g in grupos_validos and p in permissoes_validas
+    ]
+    remover_validos = [
+        (g, p) for g, p in remover if g in grupos_validos and p in permissoes_validas
+    ]
+    
+    colunas = (GrupoPermissaoLink.grupo_id, GrupoPermissaoLink.permissao_id)
+    existentes = vinculos_existentes(session, colunas, adicionar_validos + remover_validos)
+    novos = [vinculo for vinculo in adicionar_validos if vinculo not in existentes]
+    retirados = [vinculo for vinculo in remover_validos if vinculo in existentes]
+    
+    adicionados = inserir_vinculos(
+        session, GrupoPermissaoLink, [{"grupo_id": g, "permissao_id": p} for g, p in novos]
+    )
+    removidos = remover_vinculos(session, GrupoPermissaoLink, colunas, retirados)
+    atualizar_efetivas_grupo_permissao(session, adicionados=novos, removidos=retirados)
+    if novos or retirados:
+        registrar_evento(
+            session, 
+            "grupos_permissoes_lote", 
+            usuarios=usuarios_dos_grupos(session, (g for g, _ in novos + retirados))
+        )
+    session.commit()
+    
+    return LoteResponse(
+        adicionados=adicionados,
+        removidos=removidos,
+        ignorados=len(adicionar) + len(remover) - len(adicionar_validos) - len(remover_validos),
+    )
+    
 @router.get(
     "/{id}", 
     response_model=GrupoResponse,
@@ -75,17 +159,18 @@ async def criar_grupo(
 async def buscar_grupo_por_id(
     *, 
     id: int, 
-    session: Session = SessionDep
+    session: AsyncSession = AsyncSessionDep
 ) -> GrupoResponse:
     """Busca um grupo pelo ID"""
     
-    grupo = session.get(Grupo, id)
+    grupo = await session.get(Grupo, id, options=[selectinload(Grupo.permissoes)])
     if not grupo:
         raise HTTPException(status_code=404, detail="Grupo não encontrado")
     
     return GrupoResponse(
         id = grupo.id,
         nome_grupo = grupo.nome_grupo,
+        grupo_pai_id = grupo.grupo_pai_id,
         permissoes = [{"id": permissao.id, "nome_permissao": permissao.nome_permissao} for permissao in grupo.permissoes],
     )
     
@@ -94,7 +179,7 @@ async def buscar_grupo_por_id(
     response_model=GrupoResponse,
     dependencies=[Depends(ValidarPermissoes(["update:grupo"]))]
 )
-async def atualizar_grupo(
+def atualizar_grupo(
     *, 
     id: int, 
     patch_data: GrupoRequest, 
@@ -113,15 +198,40 @@ async def atualizar_grupo(
     
     permissoes = session.exec(select(Permissao).where(Permissao.id.in_(patch_data.permissoes_id))).all()
     
+    permissoes_anteriores = {permissao.id for permissao in grupo.permissoes}
+    permissoes_novas = {permissao.id for permissao in permissoes}
+    grupo_pai_anterior = grupo.grupo_pai_id
+    
     grupo.nome_grupo = patch_data.nome_grupo
     grupo.permissoes = permissoes
     
     session.add(grupo)
+    session.flush()
+    # Só move o grupo se o pai for informado, inclusive como null para a raiz
+    if "grupo_pai_id" in patch_data.model_fields_set:
+        try:
+            mover_grupo(session, grupo, patch_data.grupo_pai_id)
+        except HierarquiaInvalida as e:
+            session.rollback()
+            raise HTTPException(status_code=409, detail=str(e))
+    atualizar_efetivas_grupo_permissao(
+        session,
+        adicionados=[(grupo.id, p) for p in permissoes_novas - permissoes_anteriores],
+        removidos=[(grupo.id, p) for p in permissoes_anteriores - permissoes_novas],
+    )
+    if permissoes_novas != permissoes_anteriores or grupo.grupo_pai_id != grupo_pai_anterior:
+        registrar_evento(
+            session, 
+            "grupo_atualizado", 
+            usuarios=usuarios_dos_grupos(session, [grupo.id]), 
+            grupo_id=grupo.id
+        )
     session.commit()
     
     return GrupoResponse(
         id = grupo.id,
         nome_grupo = grupo.nome_grupo,
+        grupo_pai_id = grupo.grupo_pai_id,
         permissoes = [{"id": permissao.id, "nome_permissao": permissao.nome_permissao} for permissao in permissoes],
     )
     
@@ -129,7 +239,7 @@ async def atualizar_grupo(
     "/{id}",
     dependencies=[Depends(ValidarPermissoes(["delete:grupo"]))]
 )
-async def deletar_grupo(
+def deletar_grupo(
     *, 
     id: int, 
     session: Session = SessionDep
@@ -145,6 +255,11 @@ async def deletar_grupo(
     if len(usuario_link) > 0:
         raise HTTPException(status_code=409, detail="Grupo possui usuários vinculados")
     
+    try:
+        remover_da_hierarquia(session, id)
+    except HierarquiaInvalida as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    
     session.delete(grupo)
     session.commit()
     return {"detail": "Grupo deletado com sucesso"}
\ No newline at end of file
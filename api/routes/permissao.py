@@ -3,10 +3,14 @@ from typing import List
 from fastapi import APIRouter, Depends
 from fastapi.exceptions import HTTPException
 from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from api.auth import ValidarPermissoes
-from api.database import SessionDep
+from api.database import AsyncSessionDep, SessionDep
 from api.models.usuario import Permissao, GrupoPermissaoLink
+from api.paginacao import Paginacao
+from api.services.evento import registrar_evento, usuarios_da_permissao
+from api.services.permissao import marcar_permissoes_alteradas, registro_permissoes
 from api.serializers.usuario import PermissaoResponse, PermissaoRequest
 
 router = APIRouter()
@@ -18,9 +22,10 @@ router = APIRouter()
 )
 async def listar_permissoes(
     *, 
-    session: Session = SessionDep
+    session: AsyncSession = AsyncSessionDep,
+    paginacao: Paginacao = Depends()
 ):
-    """Lista todas as permissões"""
+    """Lista as permissões, paginadas por id"""
     
     # Exclui a permissão "all:all" da lista de permissões
     # para evitar que ela seja retornada em listagens
@@ -28,7 +33,8 @@ async def listar_permissoes(
     # com o mesmo nome, já que é uma permissão especial para o grupo de 'admins'
     # e não deve ser manipulada diretamente.
     
-    permissoes = session.exec(select(Permissao).where(Permissao.nome_permissao != "all:all")).all()
+    query = select(Permissao).where(Permissao.nome_permissao != "all:all")
+    permissoes = paginacao.pagina((await session.exec(paginacao.aplicar(query, Permissao.id))).all())
     return permissoes
 
 @router.post(
@@ -37,7 +43,7 @@ async def listar_permissoes(
     status_code=201,
     dependencies=[Depends(ValidarPermissoes(["add:permissao"]))]
 )
-async def criar_permissao(
+def criar_permissao(
     *, 
     permissao: PermissaoRequest, 
     session: Session = SessionDep
@@ -51,8 +57,10 @@ async def criar_permissao(
     
     db_permissao = Permissao.model_validate(permissao)
     session.add(db_permissao)
+    marcar_permissoes_alteradas(session)
     session.commit()
     session.refresh(db_permissao)
+    registro_permissoes.reconstruir()
     return db_permissao
 
 @router.get(
@@ -63,11 +71,11 @@ async def criar_permissao(
 async def buscar_permissao_por_id(
     *, 
     id: int, 
-    session: Session = SessionDep
+    session: AsyncSession = AsyncSessionDep
 ):
     """Busca uma permissão pelo ID"""
     
-    permissao = session.get(Permissao, id)
+    permissao = await session.get(Permissao, id)
     if not permissao:
         raise HTTPException(status_code=404, detail="Permissão não encontrada")
     
@@ -78,7 +86,7 @@ async def buscar_permissao_por_id(
     response_model=PermissaoResponse,
     dependencies=[Depends(ValidarPermissoes(["update:permissao"]))]
 )
-async def atualizar_permissao(
+def atualizar_permissao(
     *, 
     id: int, 
     patch_data: PermissaoRequest, 
@@ -95,15 +103,23 @@ async def atualizar_permissao(
     
     permissao.nome_permissao = patch_data.nome_permissao
     session.add(permissao)
+    marcar_permissoes_alteradas(session)
+    registrar_evento(
+        session, 
+        "permissao_renomeada", 
+        usuarios=usuarios_da_permissao(session, permissao.id), 
+        permissao_id=permissao.id
+    )
     session.commit()
     session.refresh(permissao)
+    registro_permissoes.reconstruir()
     return permissao
 
 @router.delete(
     "/{id}",
     dependencies=[Depends(ValidarPermissoes(["delete:permissao"]))]
 )
-async def deletar_permissao(
+def deletar_permissao(
     *, 
     id: int, 
     session: Session = SessionDep
@@ -119,5 +135,8 @@ async def deletar_permissao(
         raise HTTPException(status_code=409, detail="Permissão está vinculada a um grupo")
     
     session.delete(permissao)
+    marcar_permissoes_alteradas(session)
+    registrar_evento(session, "permissao_removida", permissao_id=id)
     session.commit()
+    registro_permissoes.reconstruir()
     return {"detail": "Permissão deletada com sucesso"}
\ No newline at end of file
@@ -1,26 +1,57 @@
+import csv
+import io
+import json
 import uuid
+from collections import defaultdict
+from datetime import datetime
+from typing import Iterator, Literal, Union
 
 from fastapi import APIRouter, File, UploadFile, Form, status, Depends, Body, BackgroundTasks
+from fastapi.responses import StreamingResponse
 from fastapi.exceptions import HTTPException
+from pydantic import ValidationError
+from sqlalchemy import insert, update
+from sqlalchemy.orm import noload
 from sqlmodel import Session, select
 
 from api.auth import ValidarPermissoes
+from api.config import IMPORT_BATCH_SIZE
 from api.database import SessionDep
-from api.models.usuario import Usuario, Grupo
-from api.services.usuario import get_permissoes
-from api.security import criar_hash_senha
+from api.models.usuario import Usuario, Grupo, UsuarioGrupoLink
+from api.paginacao import Paginacao
+from api.services.evento import registrar_evento
+from api.services.lote import (
+    em_lotes, 
+    ids_existentes, 
+    inserir_vinculos, 
+    remover_vinculos,
+    vinculos_existentes
+)
+from api.services.permissao import atualizar_efetivas_usuario_grupo, registro_permissoes
+from api.services.usuario import (
+    get_permissoes, 
+    invalidar_status_usuario, 
+    iterar_usuarios_grupos
+)
+from api.security import criar_hash_senha_no_pool, criar_hashes_senhas_no_pool
 
 from api.serializers.usuario import (
     UsuarioResponse,
     UsuarioGrupoResponse,
+    UsuarioImportacaoRequest,
+    UsuarioImportacaoResultado,
+    UsuarioImportacaoResponse,
     UsuarioAtivoPatchRequest,
     UsuarioGrupoPatchRequest,
+    UsuarioGrupoLoteRequest,
+    LoteResponse,
     UsuarioSenhaPatchRequest,
 )
 
 from api.auth import (
+    IdentidadeAtiva,
+    IdentidadeRequisicao,
     PodeAlterarSenha,
-    UsuarioAutenticado,
     buscar_super_usuario, 
     buscar_usuario_atual_ativo
 )
@@ -38,17 +69,35 @@ router = APIRouter()
     response_model=list[UsuarioGrupoResponse], 
     dependencies=[Depends(ValidarPermissoes(["read:usuario"]))]
 )
-async def listar_usuarios(
+def listar_usuarios(
     *,
-    session: Session = SessionDep
+    session: Session = SessionDep,
+    paginacao: Paginacao = Depends()
 ):
-    """Lista todos os usuários com seus grupos"""
+    """Lista os usuários com seus grupos, paginados por id"""
     
-    usuarios = session.exec(select(Usuario).where(Usuario.nome_usuario != 'admin').order_by(Usuario.id)).all()
+    query = (
+        select(Usuario)
+        .options(noload(Usuario.grupos))
+        .where(Usuario.nome_usuario != 'admin')
+    )
+    usuarios = paginacao.pagina(session.exec(paginacao.aplicar(query, Usuario.id)).all())
+    
+    # Carrega os grupos de todos os usuários da página em uma única consulta
+    grupos_usuarios = defaultdict(list)
+    if usuarios:
+        query_grupos = (
+            select(UsuarioGrupoLink.usuario_id, Grupo.nome_grupo)
+            .join(Grupo, Grupo.id == UsuarioGrupoLink.grupo_id)
+            .where(UsuarioGrupoLink.usuario_id.in_([usuario.id for usuario in usuarios]))
+            .order_by(Grupo.id)
+        )
+        for usuario_id, nome_grupo in session.exec(query_grupos).all():
+            grupos_usuarios[usuario_id].append(nome_grupo)
     
     response = []
     for usuario in usuarios:
-        grupos = [grupo.nome_grupo for grupo in usuario.grupos]
+        grupos = grupos_usuarios[usuario.id]
         response.append(
             UsuarioGrupoResponse(
                 id=usuario.id,
@@ -68,7 +117,7 @@ async def listar_usuarios(
     status_code=201,
     dependencies=[Depends(ValidarPermissoes(["add:usuario"]))]
 )
-async def criar_usuario(
+def criar_usuario(
     *,
     nome_usuario: str = Form(...),
     nome_pessoa: str = Form(...),
@@ -96,7 +145,7 @@ async def criar_usuario(
     db_usuario = Usuario(
         nome_usuario=nome_usuario,
         nome_pessoa=nome_pessoa,
-        senha=criar_hash_senha(senha),
+        senha=criar_hash_senha_no_pool(senha),
         email=email,
         grupos=grupos_db
     )
@@ -109,23 +158,231 @@ async def criar_usuario(
         db_usuario.avatar = avatar_nome
         
     session.add(db_usuario)
+    session.flush()
+    atualizar_efetivas_usuario_grupo(
+        session, adicionados=[(db_usuario.id, grupo.id) for grupo in grupos_db]
+    )
     session.commit()
     session.refresh(db_usuario)
+    invalidar_status_usuario(db_usuario.nome_usuario)
     return {"detail": "Usuário criado com sucesso."}
 
+def _ler_registros(
+    conteudo: str, 
+    formato: str
+) -> Iterator[tuple[int, Union[dict, json.JSONDecodeError]]]:
+    """
+    Retorna o número da linha e o registro de cada linha do arquivo.
+    Uma linha NDJSON malformada retorna o erro no lugar do registro,
+    para ser relatada sem interromper a importação das demais.
+    """
+    
+    if formato == "csv":
+        # A linha 1 é o cabeçalho
+        for linha, registro in enumerate(csv.DictReader(io.StringIO(conteudo)), start=2):
+            yield linha, registro
+        return
+    
+    for linha, texto in enumerate(conteudo.splitlines(), start=1):
+        if texto.strip():
+            try:
+                yield linha, json.loads(texto)
+            except json.JSONDecodeError as e:
+                yield linha, e
+
+@router.post(
+    "/importar",
+    response_model=UsuarioImportacaoResponse,
+    dependencies=[Depends(ValidarPermissoes(["add:usuario"]))]
+)
+def importar_usuarios(
+    *,
+    arquivo: UploadFile = File(...),
+    formato: Literal["ndjson", "csv"] = "ndjson",
+    session: Session = SessionDep
+):
+    """Importa usuários em lote a partir de um arquivo NDJSON ou CSV"""
+    
+    try:
+        conteudo = arquivo.file.read().decode("utf-8-sig")
+    except UnicodeDecodeError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, 
+            detail="Arquivo inválido: o conteúdo deve estar codificado em UTF-8"
+        )
+    
+    resultados: list[UsuarioImportacaoResultado] = []
+    validos: list[tuple[int, UsuarioImportacaoRequest]] = []
+    
+    def erro(linha: int, detalhe: str, nome_usuario: str = None):
+        resultados.append(
+            UsuarioImportacaoResultado(
+                linha=linha, nome_usuario=nome_usuario, criado=False, detalhe=detalhe
+            )
+        )
+    
+    try:
+        for linha, registro in _ler_registros(conteudo, formato):
+            if isinstance(registro, json.JSONDecodeError):
+                erro(linha, f"JSON inválido: {registro.msg}")
+                continue
+            if not isinstance(registro, dict):
+                erro(linha, "Dados inválidos: cada linha deve ser um objeto")
+                continue
+            try:
+                validos.append((linha, UsuarioImportacaoRequest.model_validate(registro)))
+            except ValidationError as e:
+                nome_usuario = registro.get("nome_usuario")
+                erro(
+                    linha, 
+                    f"Dados inválidos: {e.errors()[0]['loc']}", 
+                    nome_usuario if isinstance(nome_usuario, str) else None
+                )
+    except csv.Error as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Arquivo inválido: {e}")
+    
+    # Verificações de unicidade e de grupos com consultas por conjunto
+    emails = list({usuario.email for _, usuario in validos})
+    nomes = list({usuario.nome_usuario for _, usuario in validos})
+    grupos_ids = {grupo for _, usuario in validos for grupo in usuario.grupos}
+    
+    emails_existentes, nomes_existentes = set(), set()
+    for lote in em_lotes(emails, IMPORT_BATCH_SIZE):
+        emails_existentes.update(session.exec(select(Usuario.email).where(Usuario.email.in_(lote))).all())
+    for lote in em_lotes(nomes, IMPORT_BATCH_SIZE):
+        nomes_existentes.update(session.exec(select(Usuario.nome_usuario).where(Usuario.nome_usuario.in_(lote))).all())
+    grupos_existentes = ids_existentes(session, Grupo.id, grupos_ids)
+    
+    aceitos: list[tuple[int, UsuarioImportacaoRequest]] = []
+    for linha, usuario in validos:
+        if usuario.email in emails_existentes:
+            erro(linha, "Email já cadastrado", usuario.nome_usuario)
+        elif usuario.nome_usuario in nomes_existentes:
+            erro(linha, "Nome de usuário já cadastrado", usuario.nome_usuario)
+        elif not grupos_existentes.issuperset(usuario.grupos):
+            erro(linha, "Alguns grupos não foram encontrados", usuario.nome_usuario)
+        else:
+            # Impede duplicatas dentro do próprio arquivo
+            emails_existentes.add(usuario.email)
+            nomes_existentes.add(usuario.nome_usuario)
+            aceitos.append((linha, usuario))
+    
+    hashes = criar_hashes_senhas_no_pool([usuario.senha for _, usuario in aceitos])
+    
+    data_criacao = datetime.now()
+    for lote in em_lotes(list(zip(aceitos, hashes)), IMPORT_BATCH_SIZE):
+        ids = session.execute(
+            insert(Usuario).returning(Usuario.id, sort_by_parameter_order=True),
+            [
+                {
+                    "nome_usuario": usuario.nome_usuario,
+                    "nome_pessoa": usuario.nome_pessoa,
+                    "email": usuario.email,
+                    "senha": hash_senha,
+                    "ativo": True,
+                    "data_criacao": data_criacao,
+                }
+                for (_, usuario), hash_senha in lote
+            ],
+        ).scalars().all()
+        
+        links = [
+            {"usuario_id": usuario_id, "grupo_id": grupo_id}
+            for usuario_id, ((_, usuario), _) in zip(ids, lote)
+            for grupo_id in set(usuario.grupos)
+        ]
+        if links:
+            session.execute(insert(UsuarioGrupoLink), links)
+            atualizar_efetivas_usuario_grupo(
+                session, adicionados=[(link["usuario_id"], link["grupo_id"]) for link in links]
+            )
+        session.commit()
+        
+        invalidar_status_usuario(*(usuario.nome_usuario for (_, usuario), _ in lote))
+        resultados.extend(
+            UsuarioImportacaoResultado(linha=linha, nome_usuario=usuario.nome_usuario, criado=True)
+            for (linha, usuario), _ in lote
+        )
+    
+    resultados.sort(key=lambda resultado: resultado.linha)
+    criados = sum(resultado.criado for resultado in resultados)
+    return UsuarioImportacaoResponse(
+        criados=criados,
+        erros=len(resultados) - criados,
+        resultados=resultados,
+    )
+
+@router.post(
+    "/grupos/lote",
+    response_model=LoteResponse,
+    dependencies=[Depends(ValidarPermissoes(["update:usuariogrupo"]))]
+)
+def atualizar_grupos_usuarios_em_lote(
+    *,
+    session: Session = SessionDep,
+    patch_data: UsuarioGrupoLoteRequest,
+) -> LoteResponse:
+    """Adiciona e remove usuários de grupos em lote, em uma única transação"""
+    
+    adicionar = {(v.usuario_id, v.grupo_id) for v in patch_data.adicionar}
+    remover = {(v.usuario_id, v.grupo_id) for v in patch_data.remover}
+    
+    usuarios_validos = ids_existentes(session, Usuario.id, (u for u, _ in adicionar | remover))
+    grupos_validos = ids_existentes(session, Grupo.id, (g for _, g in adicionar | remover))
+    adicionar_validos = [
+        (u, g) for u, g in adicionar if u in usuarios_validos and g in grupos_validos
+    ]
+    remover_validos = [
+        (u, g) for u, g in remover if u in usuarios_validos and g in grupos_validos
+    ]
+    
+    colunas = (UsuarioGrupoLink.usuario_id, UsuarioGrupoLink.grupo_id)
+    existentes = vinculos_existentes(session, colunas, adicionar_validos + remover_validos)
+    novos = [vinculo for vinculo in adicionar_validos if vinculo not in existentes]
+    retirados = [vinculo for vinculo in remover_validos if vinculo in existentes]
+    
+    adicionados = inserir_vinculos(
+        session, UsuarioGrupoLink, [{"usuario_id": u, "grupo_id": g} for u, g in novos]
+    )
+    removidos = remover_vinculos(session, UsuarioGrupoLink, colunas, retirados)
+    atualizar_efetivas_usuario_grupo(session, adicionados=novos, removidos=retirados)
+    
+    # Revoga os tokens dos usuários afetados uma única vez por lote
+    afetados = list({u for u, _ in novos} | {u for u, _ in retirados})
+    nomes_afetados = []
+    for lote in em_lotes(afetados):
+        session.execute(
+            update(Usuario)
+            .where(Usuario.id.in_(lote))
+            .values(token_version=Usuario.token_version + 1)
+        )
+        nomes_afetados.extend(session.exec(select(Usuario.nome_usuario).where(Usuario.id.in_(lote))).all())
+    if nomes_afetados:
+        registrar_evento(session, "usuarios_grupos_lote", usuarios=nomes_afetados)
+    session.commit()
+    invalidar_status_usuario(*nomes_afetados)
+    
+    return LoteResponse(
+        adicionados=adicionados,
+        removidos=removidos,
+        ignorados=len(adicionar) + len(remover) - len(adicionar_validos) - len(remover_validos),
+    )
+
 @router.get(
     "/me", 
     response_model=UsuarioGrupoResponse
 )
-async def buscar_usuario_logado(
+def buscar_usuario_logado(
     *, 
     session: Session = SessionDep, 
-    usuario: Usuario = UsuarioAutenticado
+    identidade: IdentidadeRequisicao = IdentidadeAtiva
 ):
     """Retorna dados do usuário autenticado"""
     
     with session:
-        usuario = session.exec(select(Usuario).where(Usuario.id == usuario.id)).first()
+        usuario = session.exec(
+            select(Usuario).where(Usuario.nome_usuario == identidade.payload.get("sub"))
+        ).first()
         if usuario:
             grupos = [grupo.nome_grupo for grupo in usuario.grupos]
             return UsuarioGrupoResponse(
@@ -138,16 +395,50 @@ async def buscar_usuario_logado(
                 grupos=grupos
             )   
 
+colunas_exportacao = ["id", "nome_usuario", "nome_pessoa", "email", "avatar", "ativo", "grupos"]
+
+def _exportar_ndjson():
+    for usuario in iterar_usuarios_grupos():
+        yield json.dumps(usuario, ensure_ascii=False) + "\n"
+        
+def _exportar_csv():
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(colunas_exportacao)
+    for usuario in iterar_usuarios_grupos():
+        usuario["grupos"] = ";".join(usuario["grupos"])
+        writer.writerow([usuario[coluna] for coluna in colunas_exportacao])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+@router.get(
+    "/exportar",
+    dependencies=[Depends(ValidarPermissoes(["read:usuario"]))]
+)
+async def exportar_usuarios(
+    *,
+    formato: Literal["ndjson", "csv"] = "ndjson",
+):
+    """Exporta todos os usuários com seus grupos em NDJSON ou CSV, via streaming"""
+    
+    if formato == "csv":
+        return StreamingResponse(
+            _exportar_csv(), 
+            media_type="text/csv",
+            headers={"Content-Disposition": "attachment; filename=usuarios.csv"},
+        )
+    return StreamingResponse(_exportar_ndjson(), media_type="application/x-ndjson")
+
 @router.get(
     "/{id}",
     response_model=UsuarioGrupoResponse,
-    dependencies=[Depends(ValidarPermissoes(["read:usuario"]))]
+    dependencies=[Depends(ValidarPermissoes(["read:usuario"])), IdentidadeAtiva]
 )
-async def buscar_usuario_por_id(
+def buscar_usuario_por_id(
     *,
     session: Session = SessionDep,
     id: int,
-    depends: Usuario = Depends(buscar_usuario_atual_ativo),
 ) -> UsuarioGrupoResponse:
     """Busca um usuário pelo ID"""
     
@@ -170,7 +461,7 @@ async def buscar_usuario_por_id(
     "/{id}/avatar",
     status_code=200,
 )
-async def atualizar_avatar_usuario(
+def atualizar_avatar_usuario(
     *,
     session: Session = SessionDep,
     id: int,
@@ -179,13 +470,17 @@ async def atualizar_avatar_usuario(
 ) -> UsuarioResponse:
     """Atualiza o avatar de um usuário"""
     
-    permissoes_usuario = get_permissoes(usuario.nome_usuario)
+    registro_permissoes.garantir_carregado()
+    acesso_total = registro_permissoes.atende(
+        registro_permissoes.compilar(get_permissoes(usuario.nome_usuario), estrito=False),
+        registro_permissoes.compilar_requisitos(["all:all"]),
+    )
     
     usuario_buscado = session.get(Usuario, id)
     if not usuario_buscado:
         raise HTTPException(status_code=404, detail="Usuário não encontrado")
     
-    if usuario.id != id and "all:all" not in permissoes_usuario:
+    if usuario.id != id and not acesso_total:
         raise HTTPException(status_code=403, detail="Você não tem permissão para atualizar o avatar de outro usuário")
      
     if avatar.content_type not in tipos_imagem_permitidos:
@@ -204,7 +499,7 @@ async def atualizar_avatar_usuario(
     status_code=200,
     dependencies=[Depends(ValidarPermissoes(["update:usuariogrupo"]))]
 )
-async def atualizar_grupos_usuario(
+def atualizar_grupos_usuario(
     *,
     session: Session = SessionDep,
     id: int,
@@ -217,11 +512,22 @@ async def atualizar_grupos_usuario(
         raise HTTPException(status_code=404, detail="Usuário não encontrado")
     
     grupos = session.exec(select(Grupo).where(Grupo.id.in_(patch_data.grupos))).all()
+    grupos_anteriores = {grupo.id for grupo in usuario.grupos}
+    grupos_novos = {grupo.id for grupo in grupos}
     usuario.grupos = grupos
+    session.flush()
+    atualizar_efetivas_usuario_grupo(
+        session,
+        adicionados=[(usuario.id, g) for g in grupos_novos - grupos_anteriores],
+        removidos=[(usuario.id, g) for g in grupos_anteriores - grupos_novos],
+    )
+    usuario.token_version += 1
+    registrar_evento(session, "usuario_grupos_atualizados", usuarios=[usuario.nome_usuario])
     
     session.add(usuario)
     session.commit()
     session.refresh(usuario)
+    invalidar_status_usuario(usuario.nome_usuario)
     return UsuarioGrupoResponse(
         id=usuario.id,
         nome_usuario=usuario.nome_usuario,
@@ -235,7 +541,7 @@ async def atualizar_grupos_usuario(
 @router.patch(
     "/{nome_usuario}/senha",
 )
-async def atualizar_senha_usuario(
+def atualizar_senha_usuario(
     *,
     session: Session = SessionDep,
     patch_data: UsuarioSenhaPatchRequest,
@@ -243,17 +549,19 @@ async def atualizar_senha_usuario(
 ):
     """Atualiza a senha de um usuário"""
     
-    usuario.senha = patch_data.senha_hash
+    usuario.senha = patch_data.senha_hash()
+    usuario.token_version += 1
     session.add(usuario)
     session.commit()
     session.refresh(usuario)
+    invalidar_status_usuario(usuario.nome_usuario)
     return {"detail": "Senha atualizada com sucesso!"}
 
 @router.patch(
     "/{id}/status",
     status_code=200,
 )
-async def atualizar_status_usuario(
+def atualizar_status_usuario(
     *,
     id: int,
     patch_data: UsuarioAtivoPatchRequest,
@@ -267,9 +575,12 @@ async def atualizar_status_usuario(
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Usuário não encontrado")
     
     db_usuario.ativo = patch_data.ativo
+    db_usuario.token_version += 1
+    registrar_evento(session, "usuario_status_atualizado", usuarios=[db_usuario.nome_usuario])
     session.add(db_usuario)
     session.commit()
     session.refresh(db_usuario)
+    invalidar_status_usuario(db_usuario.nome_usuario)
     
     return UsuarioGrupoResponse(
         id=db_usuario.id,
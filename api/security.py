@@ -1,13 +1,21 @@
 """Utilitários de segurança"""
 
-from typing import Any
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Optional
 
 from passlib.context import CryptContext
 from pydantic import GetCoreSchemaHandler
 from pydantic_core import CoreSchema, core_schema
 
+from api.config import HASH_POOL_WORKERS
+
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+_hash_pool: Optional[ProcessPoolExecutor] = None
+
 def verificar_senha(senha, hash_senha) -> bool:
     """Verifica se a senha informada é válida"""
     
@@ -18,6 +26,63 @@ def criar_hash_senha(senha) -> str:
     
     return pwd_context.hash(senha)
 
+def _criar_hashes_senhas(senhas: list[str]) -> list[str]:
+    """Cria os hashes de um lote de senhas, executado dentro do pool"""
+    
+    return [criar_hash_senha(senha) for senha in senhas]
+
+def _quantidade_workers() -> int:
+    return HASH_POOL_WORKERS or os.cpu_count() or 1
+
+def get_hash_pool() -> ProcessPoolExecutor:
+    """Retorna o pool de processos usado para o bcrypt, criando-o se necessário"""
+    
+    global _hash_pool
+    if _hash_pool is None:
+        # Fork copiaria as threads e as conexões do processo da aplicação;
+        # os workers partem de um processo limpo (forkserver, ou spawn onde não houver)
+        metodo = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+        _hash_pool = ProcessPoolExecutor(
+            max_workers=_quantidade_workers(), 
+            mp_context=multiprocessing.get_context(metodo)
+        )
+    return _hash_pool
+
+def encerrar_hash_pool():
+    """Encerra o pool de processos do bcrypt"""
+    
+    global _hash_pool
+    if _hash_pool is not None:
+        _hash_pool.shutdown(wait=True, cancel_futures=True)
+        _hash_pool = None
+
+async def verificar_senha_async(senha, hash_senha) -> bool:
+    """Verifica a senha no pool de processos, sem bloquear o event loop"""
+    
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_hash_pool(), verificar_senha, senha, hash_senha)
+
+def criar_hash_senha_no_pool(senha) -> str:
+    """
+    Cria o hash da senha no pool de processos. Bloqueia até o resultado,
+    então deve ser chamada pelas rotas síncronas, executadas no threadpool.
+    """
+    
+    return get_hash_pool().submit(criar_hash_senha, senha).result()
+
+def criar_hashes_senhas_no_pool(senhas: list[str]) -> list[str]:
+    """Cria os hashes de várias senhas, distribuindo lotes entre os processos do pool"""
+    
+    if not senhas:
+        return []
+    # Alguns lotes por processo equilibram a carga sem excesso de mensagens
+    tamanho_lote = max(1, -(-len(senhas) // (_quantidade_workers() * 4)))
+    lotes = get_hash_pool().map(
+        _criar_hashes_senhas, 
+        [senhas[i:i + tamanho_lote] for i in range(0, len(senhas), tamanho_lote)]
+    )
+    return [hash_senha for lote in lotes for hash_senha in lote]
+
 class HashedPassword(str):
     """Classe para representar uma senha criptografada"""
     
@@ -32,5 +97,5 @@ class HashedPassword(str):
         if not isinstance(v, str):
             raise ValueError("Senha inválida")
         
-        hashed_senha = criar_hash_senha(v)
-        return cls(hashed_senha)
\ No newline at end of file
+        hashed_senha = criar_hash_senha_no_pool(v)
+        return cls(hashed_senha)
@@ -1,9 +1,10 @@
-from typing import Optional
+from typing import Optional, Union
 from datetime import datetime
 from fastapi import HTTPException
-from pydantic import BaseModel, model_validator
+from pydantic import BaseModel, Field, model_validator
 
-from api.security import criar_hash_senha
+from api.config import DECISOES_MAX, INTROSPECCAO_MAX
+from api.security import criar_hash_senha_no_pool
 
 class UsuarioResponse(BaseModel):
     """Representa o modelo de resposta do usuário"""
@@ -38,6 +39,39 @@ class UsuarioRequest(BaseModel):
     grupos: list[int] = []
     data_criacao: Optional[datetime] = datetime.now()
     
+class UsuarioImportacaoRequest(BaseModel):
+    """Representa uma linha da importação em lote de usuários"""
+    
+    nome_usuario: str
+    nome_pessoa: str
+    senha: str
+    email: str
+    grupos: list[int] = []
+    
+    @model_validator(mode="before")
+    @classmethod
+    def separar_grupos(cls, values):
+        """No CSV os grupos são informados como ids separados por ';'"""
+        
+        if isinstance(values, dict) and isinstance(values.get("grupos"), str):
+            values["grupos"] = [grupo for grupo in values["grupos"].split(";") if grupo.strip()]
+        return values
+    
+class UsuarioImportacaoResultado(BaseModel):
+    """Resultado da importação de uma linha"""
+    
+    linha: int
+    nome_usuario: Optional[str] = None
+    criado: bool
+    detalhe: Optional[str] = None
+    
+class UsuarioImportacaoResponse(BaseModel):
+    """Relatório da importação em lote de usuários"""
+    
+    criados: int
+    erros: int
+    resultados: list[UsuarioImportacaoResultado] = []
+    
 class UsuarioPatchRequest(BaseModel):
     nome_pessoa: str
     email: str
@@ -56,9 +90,8 @@ class UsuarioSenhaPatchRequest(BaseModel):
         
         return values
     
-    @property
     def senha_hash(self) -> str:
-        return criar_hash_senha(self.senha)
+        return criar_hash_senha_no_pool(self.senha)
     
 class UsuarioAtivoPatchRequest(BaseModel):
     ativo: bool
@@ -66,17 +99,68 @@ class UsuarioAtivoPatchRequest(BaseModel):
 class UsuarioGrupoPatchRequest(BaseModel):
     grupos: list[int]
     
+class VinculoUsuarioGrupo(BaseModel):
+    usuario_id: int
+    grupo_id: int
+    
+def verificar_vinculos_conflitantes(adicionar: list[BaseModel], remover: list[BaseModel]):
+    """Rejeita lotes que adicionam e removem o mesmo vínculo"""
+    
+    conflitantes = {tuple(v.model_dump().values()) for v in adicionar} & {
+        tuple(v.model_dump().values()) for v in remover
+    }
+    if conflitantes:
+        raise HTTPException(
+            status_code=422, 
+            detail=f"Vínculos informados para adicionar e remover: {sorted(conflitantes)}"
+        )
+    
+class UsuarioGrupoLoteRequest(BaseModel):
+    """Serializador para inclusão e remoção de usuários em grupos, em lote"""
+    
+    adicionar: list[VinculoUsuarioGrupo] = []
+    remover: list[VinculoUsuarioGrupo] = []
+    
+    @model_validator(mode="after")
+    def verificar_conflitos(self):
+        verificar_vinculos_conflitantes(self.adicionar, self.remover)  # pyright: ignore
+        return self
+    
+class VinculoGrupoPermissao(BaseModel):
+    grupo_id: int
+    permissao_id: int
+    
+class GrupoPermissaoLoteRequest(BaseModel):
+    """Serializador para inclusão e remoção de permissões em grupos, em lote"""
+    
+    adicionar: list[VinculoGrupoPermissao] = []
+    remover: list[VinculoGrupoPermissao] = []
+    
+    @model_validator(mode="after")
+    def verificar_conflitos(self):
+        verificar_vinculos_conflitantes(self.adicionar, self.remover)  # pyright: ignore
+        return self
+    
+class LoteResponse(BaseModel):
+    """Quantidade de vínculos afetados por uma operação em lote"""
+    
+    adicionados: int
+    removidos: int
+    ignorados: int
+    
 class GrupoResponse(BaseModel):
     """Serializador para resposta do grupo"""
 
     id: int
     nome_grupo: str
+    grupo_pai_id: Optional[int] = None
     permissoes: list[dict] = []
     
 class GrupoRequest(BaseModel):
     """Serializador para payload de criação de grupo"""
 
     nome_grupo: str
+    grupo_pai_id: Optional[int] = None
     permissoes_id: list[int] = []
 
 class PermissaoResponse(BaseModel):
@@ -88,4 +172,87 @@ class PermissaoResponse(BaseModel):
 class PermissaoRequest(BaseModel):
     """Serializador para payload de criação de permissão"""
 
-    nome_permissao: str
\ No newline at end of file
+    nome_permissao: str
+
+class PermissaoAcaoRecurso(BaseModel):
+    """Permissão informada como par (ação, recurso), em objeto ou lista"""
+    
+    acao: str
+    recurso: str
+    
+    @model_validator(mode="before")
+    @classmethod
+    def aceitar_lista(cls, values):
+        """Aceita o par também como lista [acao, recurso]"""
+        
+        if isinstance(values, (list, tuple)) and len(values) == 2:
+            return {"acao": values[0], "recurso": values[1]}
+        return values
+    
+    def __str__(self) -> str:
+        return f"{self.acao}:{self.recurso}"
+
+class DecisaoRequest(BaseModel):
+    """
+    Serializador para consulta de decisões de autorização.
+    O usuário é identificado pelo token ou pelo nome de usuário.
+    """
+    
+    token: Optional[str] = None
+    nome_usuario: Optional[str] = None
+    permissoes: list[Union[str, PermissaoAcaoRecurso]] = Field(max_length=DECISOES_MAX)
+    
+    @model_validator(mode="after")
+    def verificar_identificacao(self):
+        """Exige exatamente um entre token e nome de usuário"""
+        
+        if (self.token is None) == (self.nome_usuario is None):
+            raise HTTPException(status_code=422, detail="Informe o token ou o nome de usuário")
+        return self
+    
+class Decisao(BaseModel):
+    """Decisão de autorização para uma permissão"""
+    
+    permissao: str
+    permitido: bool
+    
+class DecisaoResponse(BaseModel):
+    """Serializador para resposta da consulta de decisões"""
+    
+    nome_usuario: Optional[str] = None
+    ativo: bool
+    decisoes: list[Decisao]
+
+class IntrospeccaoRequest(BaseModel):
+    """Serializador para introspecção de tokens em lote"""
+    
+    tokens: list[str] = Field(max_length=INTROSPECCAO_MAX)
+    
+class IntrospeccaoResultado(BaseModel):
+    """
+    Resultado da introspecção de um token, nos moldes da RFC 7662.
+    Tokens inativos retornam apenas 'active'.
+    """
+    
+    active: bool
+    sub: Optional[str] = None
+    exp: Optional[int] = None
+    scope: Optional[str] = None
+    token_type: Optional[str] = None
+    grupos: Optional[list[str]] = None
+    permissoes: Optional[list[str]] = None
+    
+class IntrospeccaoResponse(BaseModel):
+    """Resultados da introspecção, na mesma ordem dos tokens enviados"""
+    
+    resultados: list[IntrospeccaoResultado]
+
+class EventoResponse(BaseModel):
+    """Serializador para os eventos de alteração de permissões"""
+    
+    seq: int
+    tipo: str
+    usuarios: list[str] = []
+    grupo_id: Optional[int] = None
+    permissao_id: Optional[int] = None
+    criado_em: datetime
@@ -0,0 +1,81 @@
+from typing import Iterable, Optional
+
+from sqlalchemy import func
+from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from api.models.evento import EventoPermissao
+from api.models.usuario import (
+    GrupoHierarquia, 
+    Usuario, 
+    UsuarioGrupoLink, 
+    UsuarioPermissaoEfetiva
+)
+from api.services.lote import em_lotes
+
+def registrar_evento(
+    session: Session,
+    tipo: str,
+    usuarios: Iterable[str] = (),
+    grupo_id: Optional[int] = None,
+    permissao_id: Optional[int] = None,
+):
+    """
+    Registra uma alteração de permissões. Deve ser chamada antes do commit,
+    para que o evento seja gravado na mesma transação da alteração.
+    """
+
+    session.add(
+        EventoPermissao(
+            tipo=tipo,
+            usuarios=sorted(set(usuarios)),
+            grupo_id=grupo_id,
+            permissao_id=permissao_id,
+        )
+    )
+
+def usuarios_dos_grupos(session: Session, grupo_ids: Iterable[int]) -> list[str]:
+    """Retorna os usuários dos grupos informados e de seus subgrupos"""
+
+    usuarios = set()
+    for lote in em_lotes(list(set(grupo_ids))):
+        usuarios.update(
+            session.exec(
+                select(Usuario.nome_usuario)
+                .join(UsuarioGrupoLink, UsuarioGrupoLink.usuario_id == Usuario.id)
+                .join(GrupoHierarquia, GrupoHierarquia.descendente_id == UsuarioGrupoLink.grupo_id)
+                .where(GrupoHierarquia.ancestral_id.in_(lote))
+            ).all()
+        )
+    return sorted(usuarios)
+
+def usuarios_da_permissao(session: Session, permissao_id: int) -> list[str]:
+    """Retorna os usuários que possuem a permissão"""
+
+    return list(
+        session.exec(
+            select(Usuario.nome_usuario)
+            .join(UsuarioPermissaoEfetiva, UsuarioPermissaoEfetiva.usuario_id == Usuario.id)
+            .where(UsuarioPermissaoEfetiva.permissao_id == permissao_id)
+        ).all()
+    )
+
+async def listar_eventos(
+    session: AsyncSession,
+    desde: int,
+    limite: int
+) -> list[EventoPermissao]:
+    """Retorna os eventos com seq maior que 'desde', em ordem"""
+
+    query = (
+        select(EventoPermissao)
+        .where(EventoPermissao.seq > desde)
+        .order_by(EventoPermissao.seq)
+        .limit(limite)
+    )
+    return list((await session.exec(query)).all())
+
+async def ultimo_seq(session: AsyncSession) -> int:
+    """Retorna o seq do evento mais recente, ou 0 se não houver eventos"""
+
+    return (await session.exec(select(func.max(EventoPermissao.seq)))).one() or 0
@@ -0,0 +1,117 @@
+from typing import Optional
+
+from sqlalchemy import delete, literal
+from sqlmodel import Session, select
+
+from api.database import engine
+from api.models.usuario import Grupo, GrupoHierarquia
+from api.services.permissao import atualizar_efetivas_hierarquia
+
+class HierarquiaInvalida(ValueError):
+    """Erro ao posicionar um grupo na hierarquia"""
+
+def _inserir_caminhos(session: Session, grupo_id: int, grupo_pai_id: Optional[int]):
+    """
+    Liga a subárvore do grupo a todos os ancestrais do novo pai.
+    A subárvore já deve conter a linha do próprio grupo.
+    """
+
+    if grupo_pai_id is None:
+        return
+
+    subarvore = GrupoHierarquia.__table__.alias("subarvore")
+    ancestrais = GrupoHierarquia.__table__.alias("ancestrais")
+    session.connection().execute(
+        GrupoHierarquia.__table__.insert().from_select(
+            ["ancestral_id", "descendente_id", "profundidade"],
+            select(
+                ancestrais.c.ancestral_id,
+                subarvore.c.descendente_id,
+                ancestrais.c.profundidade + subarvore.c.profundidade + 1,
+            )
+            .select_from(subarvore)
+            .join(ancestrais, literal(True))
+            .where(subarvore.c.ancestral_id == grupo_id)
+            .where(ancestrais.c.descendente_id == grupo_pai_id)
+        )
+    )
+
+def _validar_pai(session: Session, grupo_id: Optional[int], grupo_pai_id: Optional[int]):
+    """Garante que o pai existe e que não está na subárvore do grupo"""
+
+    if grupo_pai_id is None:
+        return
+    if session.get(Grupo, grupo_pai_id) is None:
+        raise HierarquiaInvalida("Grupo pai não encontrado")
+    if grupo_id is not None and session.get(GrupoHierarquia, (grupo_id, grupo_pai_id)):
+        raise HierarquiaInvalida("A hierarquia de grupos não pode conter ciclos")
+
+def incluir_na_hierarquia(session: Session, grupo: Grupo):
+    """Registra um grupo recém-criado (já com id) na hierarquia"""
+
+    _validar_pai(session, None, grupo.grupo_pai_id)
+    session.add(GrupoHierarquia(ancestral_id=grupo.id, descendente_id=grupo.id, profundidade=0))
+    session.flush()
+    _inserir_caminhos(session, grupo.id, grupo.grupo_pai_id)
+
+def mover_grupo(session: Session, grupo: Grupo, grupo_pai_id: Optional[int]):
+    """
+    Move o grupo (com sua subárvore) para debaixo de outro pai, mantendo
+    as permissões efetivas dos usuários da subárvore em dia.
+    """
+
+    if grupo.grupo_pai_id == grupo_pai_id:
+        return
+    _validar_pai(session, grupo.id, grupo_pai_id)
+
+    # Retira o que a subárvore herdava dos ancestrais antigos
+    atualizar_efetivas_hierarquia(session, grupo.id, -1)
+
+    # Desliga a subárvore dos ancestrais antigos
+    subarvore = select(GrupoHierarquia.descendente_id).where(GrupoHierarquia.ancestral_id == grupo.id)
+    session.connection().execute(
+        delete(GrupoHierarquia.__table__)
+        .where(GrupoHierarquia.descendente_id.in_(subarvore))
+        .where(GrupoHierarquia.ancestral_id.not_in(subarvore))
+    )
+
+    grupo.grupo_pai_id = grupo_pai_id
+    session.add(grupo)
+    session.flush()
+    _inserir_caminhos(session, grupo.id, grupo_pai_id)
+
+    # Soma o que a subárvore herda dos novos ancestrais
+    atualizar_efetivas_hierarquia(session, grupo.id, 1)
+
+def remover_da_hierarquia(session: Session, grupo_id: int):
+    """Remove um grupo sem subgrupos da hierarquia"""
+
+    filho = session.exec(select(Grupo.id).where(Grupo.grupo_pai_id == grupo_id)).first()
+    if filho is not None:
+        raise HierarquiaInvalida("Grupo possui subgrupos")
+    session.connection().execute(
+        delete(GrupoHierarquia.__table__).where(GrupoHierarquia.descendente_id == grupo_id)
+    )
+
+def reconstruir_hierarquia():
+    """Recria a tabela de fechamento a partir de grupo_pai_id"""
+
+    with Session(engine) as session:
+        pais = dict(session.exec(select(Grupo.id, Grupo.grupo_pai_id)).all())
+
+        linhas = []
+        for grupo_id in pais:
+            ancestral, profundidade = grupo_id, 0
+            visitados = set()
+            while ancestral is not None and ancestral not in visitados:
+                visitados.add(ancestral)
+                linhas.append(
+                    {"ancestral_id": ancestral, "descendente_id": grupo_id, "profundidade": profundidade}
+                )
+                ancestral, profundidade = pais.get(ancestral), profundidade + 1
+
+        conexao = session.connection()
+        conexao.execute(delete(GrupoHierarquia.__table__))
+        if linhas:
+            conexao.execute(GrupoHierarquia.__table__.insert(), linhas)
+        session.commit()
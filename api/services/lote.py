@@ -0,0 +1,66 @@
+from typing import Iterable, Iterator, Type
+
+from sqlalchemy import delete, tuple_
+from sqlalchemy.dialects.sqlite import insert
+from sqlmodel import Session, SQLModel, select
+
+# Mantém as consultas abaixo do limite de variáveis do SQLite
+TAMANHO_LOTE_SQL = 500
+
+def em_lotes(itens: list, tamanho: int = TAMANHO_LOTE_SQL) -> Iterator[list]:
+    """Divide a lista em lotes de até 'tamanho' itens"""
+    
+    for i in range(0, len(itens), tamanho):
+        yield itens[i:i + tamanho]
+        
+def ids_existentes(session: Session, coluna_id, ids: Iterable[int]) -> set[int]:
+    """Retorna quais dos ids informados existem, em consultas por conjunto"""
+    
+    existentes = set()
+    for lote in em_lotes(list(set(ids))):
+        existentes.update(session.exec(select(coluna_id).where(coluna_id.in_(lote))).all())
+    return existentes
+
+def vinculos_existentes(
+    session: Session, 
+    colunas: tuple, 
+    vinculos: list[tuple]
+) -> set[tuple]:
+    """Retorna quais dos vínculos informados já existem"""
+    
+    existentes = set()
+    for lote in em_lotes(list(set(vinculos))):
+        existentes.update(
+            tuple(linha) for linha in session.exec(select(*colunas).where(tuple_(*colunas).in_(lote))).all()
+        )
+    return existentes
+
+def inserir_vinculos(
+    session: Session, 
+    modelo: Type[SQLModel], 
+    vinculos: list[dict]
+) -> int:
+    """Insere os vínculos ignorando os já existentes, retornando quantos foram criados"""
+    
+    # Executa na conexão da sessão para obter o rowcount do executemany
+    conexao = session.connection()
+    total = 0
+    for lote in em_lotes(vinculos):
+        total += conexao.execute(insert(modelo.__table__).on_conflict_do_nothing(), lote).rowcount
+    return total
+
+def remover_vinculos(
+    session: Session, 
+    modelo: Type[SQLModel], 
+    colunas: tuple, 
+    vinculos: list[tuple]
+) -> int:
+    """Remove os vínculos informados, retornando quantos foram removidos"""
+    
+    conexao = session.connection()
+    total = 0
+    for lote in em_lotes(vinculos):
+        total += conexao.execute(
+            delete(modelo.__table__).where(tuple_(*colunas).in_(lote))
+        ).rowcount
+    return total
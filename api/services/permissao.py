@@ -0,0 +1,389 @@
+import base64
+import hashlib
+import time
+from typing import Iterable, Optional
+from sqlalchemy import Integer, bindparam, delete, func
+from sqlalchemy.dialects.sqlite import insert
+from sqlmodel import Session, select
+
+from api.config import PERMISSOES_REGISTRO_TTL
+from api.database import engine
+from api.services.lote import em_lotes
+from api.models.usuario import (
+    Permissao, 
+    GrupoHierarquia,
+    GrupoPermissaoLink, 
+    UsuarioGrupoLink, 
+    UsuarioPermissaoEfetiva,
+    VersaoPermissoes
+)
+
+# Curinga aceito na ação ou no recurso ("read:*", "*:usuario", "*:*")
+CURINGA = "*"
+
+def concedentes(nome_permissao: str) -> tuple[str, ...]:
+    """Retorna as permissões que concedem a permissão "ação:recurso" informada"""
+    
+    acao, _, recurso = nome_permissao.partition(":")
+    return (
+        nome_permissao,
+        f"{acao}:{CURINGA}",
+        f"{CURINGA}:{recurso}",
+        f"{CURINGA}:{CURINGA}",
+        "all:all",
+    )
+
+class RegistroPermissoes:
+    """
+    Associa cada permissão a um bit estável, derivado do id da permissão,
+    permitindo verificar conjuntos de permissões com operações inteiras.
+    """
+    
+    def __init__(self):
+        self.versao = 0
+        self._bits: dict[str, int] = {}
+        self._linhas: list[tuple[int, str]] = []
+        self._assinaturas: dict[int, str] = {}
+        self._versao_banco: Optional[int] = None
+        self._verificado_em = 0.0
+        
+    @staticmethod
+    def _ler_versao_banco(session: Session) -> int:
+        return session.exec(
+            select(VersaoPermissoes.versao).where(VersaoPermissoes.id == 1)
+        ).first() or 0
+        
+    def reconstruir(self):
+        """Recarrega as permissões do banco de dados"""
+        
+        with Session(engine) as session:
+            versao_banco = self._ler_versao_banco(session)
+            linhas = session.exec(select(Permissao.id, Permissao.nome_permissao)).all()
+        self._bits = {nome_permissao: 1 << id for id, nome_permissao in linhas}
+        self._linhas = sorted(linhas)
+        self._assinaturas = {}
+        self._versao_banco = versao_banco
+        self._verificado_em = time.monotonic()
+        self.versao += 1
+        
+    def garantir_carregado(self):
+        """
+        Carrega o registro caso ainda não tenha sido carregado e, a cada
+        PERMISSOES_REGISTRO_TTL segundos, recarrega se outro processo
+        tiver alterado as permissões
+        """
+        
+        if self.versao == 0:
+            self.reconstruir()
+            return
+        if time.monotonic() - self._verificado_em < PERMISSOES_REGISTRO_TTL:
+            return
+        with Session(engine) as session:
+            versao_banco = self._ler_versao_banco(session)
+        self._verificado_em = time.monotonic()
+        if versao_banco != self._versao_banco:
+            self.reconstruir()
+            
+    def observar_versao(self, versao_banco: int):
+        """
+        Registra a versão do banco lida junto com outra consulta. Se não mudou,
+        dispensa a próxima verificação; se mudou, força a recarga.
+        """
+        
+        if versao_banco == self._versao_banco:
+            self._verificado_em = time.monotonic()
+        else:
+            self._verificado_em = 0.0
+        
+    def assinatura(self, mascara: int) -> str:
+        """
+        Identifica o mapeamento id -> nome dos bits até o maior bit da máscara.
+        Permissões criadas depois não alteram a assinatura, apenas
+        renomeações e exclusões de permissões cobertas pela máscara.
+        """
+        
+        ate = mascara.bit_length()
+        if (assinatura := self._assinaturas.get(ate)) is None:
+            linhas = [linha for linha in self._linhas if linha[0] < ate]
+            assinatura = hashlib.sha256(repr(linhas).encode()).hexdigest()[:12]
+            self._assinaturas[ate] = assinatura
+        return assinatura
+        
+    def bit(self, nome_permissao: str) -> int:
+        """Retorna o bit da permissão, ou 0 se ela não existir"""
+        
+        return self._bits.get(nome_permissao, 0)
+    
+    def compilar(self, permissoes: Iterable[str], estrito: bool = True) -> Optional[int]:
+        """
+        Converte uma lista de permissões em uma máscara de bits.
+        No modo estrito retorna None se alguma permissão não existir,
+        caso contrário as permissões desconhecidas são ignoradas.
+        """
+        
+        permissoes = list(permissoes)
+        bits = self._bits
+        mascara = 0
+        for nome_permissao in permissoes:
+            bit = bits.get(nome_permissao)
+            if bit is None:
+                if estrito:
+                    # A permissão pode ter sido criada por outro processo
+                    if self._recarregar_se_desconhecida(nome_permissao):
+                        return self.compilar(permissoes, estrito)
+                    return None
+                continue
+            mascara |= bit
+        return mascara
+    
+    def _recarregar_se_desconhecida(self, nome_permissao: str) -> bool:
+        """Recarrega o registro uma vez e indica se a permissão passou a existir"""
+        
+        self.reconstruir()
+        return nome_permissao in self._bits
+    
+    def nomes(self, mascara: int) -> list[str]:
+        """Converte uma máscara de bits de volta nos nomes das permissões"""
+        
+        return [nome for id, nome in self._linhas if mascara >> id & 1]
+    
+    def compilar_requisitos(self, permissoes: Iterable[str]) -> tuple[int, ...]:
+        """
+        Converte as permissões requeridas em uma máscara por permissão, com os
+        bits de todas as permissões que a concedem, curingas inclusos. Uma máscara
+        de permissões atende aos requisitos se tiver intersecção com cada um deles.
+        """
+        
+        bits = self._bits
+        return tuple(
+            sum({bits.get(nome, 0) for nome in concedentes(nome_permissao)})
+            for nome_permissao in permissoes
+        )
+    
+    @staticmethod
+    def atende(mascara: int, requisitos: tuple[int, ...]) -> bool:
+        """Verifica se a máscara concede todas as permissões requeridas"""
+        
+        for requisito in requisitos:
+            if not mascara & requisito:
+                return False
+        return True
+
+    @staticmethod
+    def codificar(mascara: int) -> str:
+        """Codifica uma máscara de bits em base64url, sem padding"""
+        
+        dados = mascara.to_bytes((mascara.bit_length() + 7) // 8, "little")
+        return base64.urlsafe_b64encode(dados).rstrip(b"=").decode()
+    
+    @staticmethod
+    def decodificar(texto: str) -> int:
+        """Decodifica uma máscara de bits codificada em base64url"""
+        
+        dados = base64.urlsafe_b64decode(texto + "=" * (-len(texto) % 4))
+        return int.from_bytes(dados, "little")
+
+registro_permissoes = RegistroPermissoes()
+
+def versao_permissoes_subquery():
+    """Subconsulta da versão das permissões, para ser lida junto com outra consulta"""
+    
+    return (
+        select(VersaoPermissoes.versao)
+        .where(VersaoPermissoes.id == 1)
+        .scalar_subquery()
+    )
+
+def marcar_permissoes_alteradas(session: Session):
+    """
+    Incrementa o contador de versão das permissões, na mesma transação
+    da alteração, para que os demais processos recarreguem o registro
+    """
+    
+    stmt = insert(VersaoPermissoes).values(id=1, versao=1)
+    session.connection().execute(
+        stmt.on_conflict_do_update(
+            index_elements=["id"], set_={"versao": VersaoPermissoes.versao + 1}
+        )
+    )
+
+def _upsert_efetiva(query_origem):
+    """INSERT ... SELECT que soma a contagem das permissões efetivas já existentes"""
+    
+    stmt = insert(UsuarioPermissaoEfetiva).from_select(
+        ["usuario_id", "permissao_id", "contagem"], query_origem
+    )
+    return stmt.on_conflict_do_update(
+        index_elements=["usuario_id", "permissao_id"],
+        set_={"contagem": UsuarioPermissaoEfetiva.contagem + stmt.excluded.contagem},
+    )
+
+# Cada vínculo usuário-grupo soma (ou subtrai) ao usuário as permissões
+# do grupo e de todos os seus ancestrais
+_delta_usuario_grupo = _upsert_efetiva(
+    select(
+        bindparam("usuario_id", type_=Integer), 
+        GrupoPermissaoLink.permissao_id, 
+        bindparam("sinal", type_=Integer)
+    )
+    .join(GrupoHierarquia, GrupoHierarquia.ancestral_id == GrupoPermissaoLink.grupo_id)
+    .where(GrupoHierarquia.descendente_id == bindparam("grupo_id"))
+)
+
+# Cada vínculo grupo-permissão soma (ou subtrai) a permissão aos usuários
+# do grupo e de todos os seus descendentes
+_delta_grupo_permissao = _upsert_efetiva(
+    select(
+        UsuarioGrupoLink.usuario_id, 
+        bindparam("permissao_id", type_=Integer), 
+        bindparam("sinal", type_=Integer)
+    )
+    .join(GrupoHierarquia, GrupoHierarquia.descendente_id == UsuarioGrupoLink.grupo_id)
+    .where(GrupoHierarquia.ancestral_id == bindparam("grupo_id"))
+)
+
+# Ao mover um grupo na hierarquia, os usuários da sua subárvore ganham (ou perdem)
+# as permissões dos ancestrais estritos do grupo
+_subarvore = GrupoHierarquia.__table__.alias("subarvore")
+_ancestrais = GrupoHierarquia.__table__.alias("ancestrais")
+_delta_hierarquia = _upsert_efetiva(
+    select(
+        UsuarioGrupoLink.usuario_id, 
+        GrupoPermissaoLink.permissao_id, 
+        bindparam("sinal", type_=Integer)
+    )
+    .select_from(_subarvore)
+    .join(UsuarioGrupoLink, UsuarioGrupoLink.grupo_id == _subarvore.c.descendente_id)
+    .join(
+        _ancestrais, 
+        (_ancestrais.c.descendente_id == _subarvore.c.ancestral_id) 
+        & (_ancestrais.c.profundidade > 0)
+    )
+    .join(GrupoPermissaoLink, GrupoPermissaoLink.grupo_id == _ancestrais.c.ancestral_id)
+    .where(_subarvore.c.ancestral_id == bindparam("grupo_id"))
+)
+
+def _membros_subarvores(grupo_ids: list[int]):
+    """Subconsulta com os usuários dos grupos informados e de seus subgrupos"""
+    
+    return (
+        select(UsuarioGrupoLink.usuario_id)
+        .join(GrupoHierarquia, GrupoHierarquia.descendente_id == UsuarioGrupoLink.grupo_id)
+        .where(GrupoHierarquia.ancestral_id.in_(grupo_ids))
+    )
+
+def _remover_zerados(session: Session, usuarios):
+    """
+    Remove as linhas zeradas apenas dos usuários afetados pelo delta ('usuarios'
+    é uma lista de ids ou uma subconsulta), usando o prefixo da chave primária
+    em vez de percorrer a tabela inteira.
+    """
+    
+    lotes = em_lotes(sorted(set(usuarios))) if isinstance(usuarios, (list, set)) else [usuarios]
+    for lote in lotes:
+        session.connection().execute(
+            delete(UsuarioPermissaoEfetiva.__table__)
+            .where(UsuarioPermissaoEfetiva.usuario_id.in_(lote))
+            .where(UsuarioPermissaoEfetiva.contagem <= 0)
+        )
+
+def atualizar_efetivas_usuario_grupo(
+    session: Session, 
+    adicionados: Iterable[tuple[int, int]] = (), 
+    removidos: Iterable[tuple[int, int]] = ()
+):
+    """
+    Aplica nas permissões efetivas os vínculos (usuario_id, grupo_id) adicionados
+    e removidos. Deve ser chamada na mesma transação da alteração dos vínculos.
+    """
+    
+    parametros = [
+        {"usuario_id": u, "grupo_id": g, "sinal": 1} for u, g in adicionados
+    ] + [
+        {"usuario_id": u, "grupo_id": g, "sinal": -1} for u, g in removidos
+    ]
+    if parametros:
+        session.connection().execute(_delta_usuario_grupo, parametros)
+        _remover_zerados(session, {parametro["usuario_id"] for parametro in parametros})
+
+def atualizar_efetivas_grupo_permissao(
+    session: Session, 
+    adicionados: Iterable[tuple[int, int]] = (), 
+    removidos: Iterable[tuple[int, int]] = ()
+):
+    """
+    Aplica nas permissões efetivas os vínculos (grupo_id, permissao_id) adicionados
+    e removidos. Deve ser chamada na mesma transação da alteração dos vínculos.
+    """
+    
+    parametros = [
+        {"grupo_id": g, "permissao_id": p, "sinal": 1} for g, p in adicionados
+    ] + [
+        {"grupo_id": g, "permissao_id": p, "sinal": -1} for g, p in removidos
+    ]
+    if parametros:
+        session.connection().execute(_delta_grupo_permissao, parametros)
+        for lote in em_lotes(sorted({parametro["grupo_id"] for parametro in parametros})):
+            _remover_zerados(session, _membros_subarvores(lote))
+
+def atualizar_efetivas_hierarquia(session: Session, grupo_id: int, sinal: int):
+    """
+    Soma (sinal 1) ou subtrai (sinal -1) das permissões efetivas o que os usuários
+    da subárvore do grupo herdam de seus ancestrais. Ao mover um grupo, deve ser
+    chamada com -1 antes e com 1 depois da alteração da hierarquia.
+    """
+    
+    session.connection().execute(_delta_hierarquia, {"grupo_id": grupo_id, "sinal": sinal})
+    _remover_zerados(session, _membros_subarvores([grupo_id]))
+
+def verificar_permissoes_efetivas(corrigir: bool = True) -> dict:
+    """
+    Compara as permissões efetivas materializadas com as calculadas a partir
+    dos grupos e, se 'corrigir' for True, reconstrói a tabela quando houver divergência.
+    Retorna a quantidade de linhas faltantes, sobrando e com contagem divergente.
+    """
+    
+    esperadas_query = (
+        select(
+            UsuarioGrupoLink.usuario_id, 
+            GrupoPermissaoLink.permissao_id, 
+            func.count()
+        )
+        .join(GrupoHierarquia, GrupoHierarquia.descendente_id == UsuarioGrupoLink.grupo_id)
+        .join(GrupoPermissaoLink, GrupoPermissaoLink.grupo_id == GrupoHierarquia.ancestral_id)
+        .group_by(UsuarioGrupoLink.usuario_id, GrupoPermissaoLink.permissao_id)
+    )
+    with Session(engine) as session:
+        esperadas = {(u, p): c for u, p, c in session.exec(esperadas_query).all()}
+        atuais = {
+            (u, p): c for u, p, c in session.exec(
+                select(
+                    UsuarioPermissaoEfetiva.usuario_id,
+                    UsuarioPermissaoEfetiva.permissao_id,
+                    UsuarioPermissaoEfetiva.contagem,
+                )
+            ).all()
+        }
+        
+        divergencias = {
+            "faltantes": len(esperadas.keys() - atuais.keys()),
+            "sobrando": len(atuais.keys() - esperadas.keys()),
+            "contagem_divergente": sum(
+                1 for chave in esperadas.keys() & atuais.keys() 
+                if esperadas[chave] != atuais[chave]
+            ),
+        }
+        
+        if corrigir and any(divergencias.values()):
+            conexao = session.connection()
+            conexao.execute(delete(UsuarioPermissaoEfetiva.__table__))
+            if esperadas:
+                conexao.execute(
+                    insert(UsuarioPermissaoEfetiva.__table__),
+                    [
+                        {"usuario_id": u, "permissao_id": p, "contagem": c} 
+                        for (u, p), c in esperadas.items()
+                    ],
+                )
+            session.commit()
+    return divergencias
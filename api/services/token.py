@@ -0,0 +1,146 @@
+from datetime import datetime
+from dateutil import tz
+from sqlalchemy import delete, update
+from sqlmodel import Session, select
+
+from api.cache import IndiceExpiravel
+from api.database import engine
+from api.models.token import RotacaoRefreshToken
+from api.services.lote import em_lotes
+
+# Índices em memória dos refresh tokens consumidos e das famílias revogadas,
+# mantidos em sincronia com a tabela de rotação.
+jtis_consumidos = IndiceExpiravel()
+familias_revogadas = IndiceExpiravel()
+
+def _utc(data: datetime) -> datetime:
+    """Converte para UTC sem fuso horário, como armazenado no SQLite"""
+    
+    if data.tzinfo is not None:
+        data = data.astimezone(tz.tzutc()).replace(tzinfo=None)
+    return data
+
+def _agora() -> datetime:
+    return datetime.now(tz=tz.tzutc()).replace(tzinfo=None)
+
+def _timestamp(data: datetime) -> float:
+    return data.replace(tzinfo=tz.tzutc()).timestamp()
+
+def registrar_refresh_token(
+    jti: str, 
+    familia: str, 
+    nome_usuario: str, 
+    expira_em: datetime
+):
+    """Registra um refresh token emitido"""
+    
+    with Session(engine) as session:
+        session.add(
+            RotacaoRefreshToken(
+                jti=jti,
+                familia=familia,
+                nome_usuario=nome_usuario,
+                expira_em=_utc(expira_em),
+            )
+        )
+        session.commit()
+        
+def consumir_refresh_token(jti: str, familia: str, expira_em: datetime) -> bool:
+    """
+    Marca o refresh token como consumido.
+    Retorna False se o token for desconhecido, já tiver sido consumido
+    ou pertencer a uma família revogada. O reuso de um token consumido
+    revoga toda a família.
+    """
+    
+    if familia in familias_revogadas:
+        return False
+    if jti in jtis_consumidos:
+        revogar_familia(familia)
+        return False
+    
+    with Session(engine) as session:
+        # O UPDATE condicional garante que o token é consumido uma única vez,
+        # mesmo entre processos diferentes.
+        resultado = session.execute(
+            update(RotacaoRefreshToken)
+            .where(RotacaoRefreshToken.jti == jti)
+            .where(RotacaoRefreshToken.consumido == False)
+            .values(consumido=True)
+        )
+        session.commit()
+        consumido_agora = resultado.rowcount == 1
+        
+        existente = consumido_agora or session.get(RotacaoRefreshToken, jti) is not None
+        
+    if consumido_agora:
+        jtis_consumidos.adicionar(jti, _timestamp(_utc(expira_em)))
+        return True
+    
+    if existente:
+        revogar_familia(familia)
+    return False
+
+def refresh_tokens_vigentes(jtis: list[str]) -> set[str]:
+    """
+    Retorna quais dos refresh tokens informados estão registrados e não foram
+    consumidos, consultando a tabela de rotação. Cobre o consumo ou a revogação
+    feitos por outro processo, que não aparecem nos índices em memória.
+    """
+    
+    vigentes = set()
+    with Session(engine) as session:
+        for lote in em_lotes(list(set(jtis))):
+            linhas = session.exec(
+                select(
+                    RotacaoRefreshToken.jti, 
+                    RotacaoRefreshToken.expira_em, 
+                    RotacaoRefreshToken.consumido
+                )
+                .where(RotacaoRefreshToken.jti.in_(lote))
+            ).all()
+            for jti, expira_em, consumido in linhas:
+                if consumido:
+                    jtis_consumidos.adicionar(jti, _timestamp(expira_em))
+                else:
+                    vigentes.add(jti)
+    return vigentes
+
+def revogar_familia(familia: str):
+    """Revoga todos os refresh tokens de uma família"""
+    
+    with Session(engine) as session:
+        tokens = session.exec(
+            select(RotacaoRefreshToken.jti, RotacaoRefreshToken.expira_em)
+            .where(RotacaoRefreshToken.familia == familia)
+        ).all()
+        session.execute(
+            update(RotacaoRefreshToken)
+            .where(RotacaoRefreshToken.familia == familia)
+            .values(consumido=True)
+        )
+        session.commit()
+        
+    for jti, expira_em in tokens:
+        jtis_consumidos.adicionar(jti, _timestamp(expira_em))
+    if tokens:
+        familias_revogadas.adicionar(
+            familia, max(_timestamp(expira_em) for _, expira_em in tokens)
+        )
+
+def carregar_indice_refresh_tokens():
+    """Remove os tokens expirados e carrega os consumidos no índice em memória"""
+    
+    jtis_consumidos.limpar()
+    familias_revogadas.limpar()
+    with Session(engine) as session:
+        session.execute(
+            delete(RotacaoRefreshToken).where(RotacaoRefreshToken.expira_em <= _agora())
+        )
+        session.commit()
+        consumidos = session.exec(
+            select(RotacaoRefreshToken.jti, RotacaoRefreshToken.expira_em)
+            .where(RotacaoRefreshToken.consumido == True)
+        ).all()
+    for jti, expira_em in consumidos:
+        jtis_consumidos.adicionar(jti, _timestamp(expira_em))
@@ -1,8 +1,42 @@
-from typing import Optional
+import json
+from itertools import groupby
+from typing import Iterable, Iterator, NamedTuple, Optional
+from sqlalchemy import func
+from sqlalchemy.orm import lazyload
 from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from api.database import engine
-from api.models.usuario import Usuario
+from api.cache import CacheTTL
+from api.config import USER_STATUS_CACHE_SIZE, USER_STATUS_CACHE_TTL
+from api.database import async_engine, engine
+from api.models.usuario import (
+    Usuario, 
+    Grupo, 
+    Permissao, 
+    UsuarioGrupoLink, 
+    UsuarioPermissaoEfetiva
+)
+from api.services.lote import em_lotes
+from api.services.permissao import registro_permissoes, versao_permissoes_subquery
+
+class UsuarioGruposPermissoes(NamedTuple):
+    """Usuário com os nomes de seus grupos e de suas permissões efetivas"""
+    
+    usuario: Usuario
+    grupos: tuple[str, ...]
+    permissoes: tuple[str, ...]
+
+class StatusUsuario(NamedTuple):
+    """Status do usuário consultado a cada requisição autenticada"""
+    
+    existe: bool
+    ativo: bool
+    token_version: int = 0
+
+cache_status_usuario = CacheTTL(
+    tamanho_maximo=USER_STATUS_CACHE_SIZE, 
+    ttl=USER_STATUS_CACHE_TTL
+)
 
 def get_usuario(nome_usuario: str) -> Optional[Usuario]:
     """Retorna um usuário pelo nome de usuário"""
@@ -11,34 +45,171 @@ def get_usuario(nome_usuario: str) -> Optional[Usuario]:
     with Session(engine) as session:
         return session.exec(query).first()
     
-def get_permissoes(nome_usuario: str) -> Optional[Usuario]:
-    """Retorna as permissões de um usuário"""
+async def get_usuario_async(nome_usuario: str) -> Optional[Usuario]:
+    """Retorna um usuário pelo nome de usuário, sem bloquear o event loop"""
     
     query = select(Usuario).where(Usuario.nome_usuario == nome_usuario)
+    async with AsyncSession(async_engine) as session:
+        return (await session.exec(query)).first()
+    
+def get_status_usuario(nome_usuario: str) -> StatusUsuario:
+    """Retorna o status do usuário, consultando antes o cache"""
+    
+    if (status := cache_status_usuario.get(nome_usuario)) is not None:
+        return status
+    
+    # A versão das permissões vem na mesma consulta, dispensando a
+    # verificação periódica do registro em uma consulta separada
+    query = (
+        select(
+            Usuario.ativo, 
+            Usuario.token_version, 
+            versao_permissoes_subquery().label("versao_permissoes")
+        )
+        .where(Usuario.nome_usuario == nome_usuario)
+    )
     with Session(engine) as session:
-        usuario = session.exec(query).one_or_none()
-        if not usuario:
-            return False
-        permissoes = []
-        for grupo in usuario.grupos:
-            permissoes.extend(grupo.permissoes)
-        permissoes_txt = [permissao.nome_permissao for permissao in permissoes]
-        permissoes_usuario = list(set(permissoes_txt))
-    return permissoes_usuario
-
-def get_usuario_grupos_permissoes(nome_usuario: str) -> Optional[Usuario]:
-    """Retorna as permissões de um grupo"""
+        linha = session.exec(query).first()
+    if linha:
+        registro_permissoes.observar_versao(linha.versao_permissoes or 0)
+        status = StatusUsuario(existe=True, ativo=linha.ativo, token_version=linha.token_version)
+    else:
+        status = StatusUsuario(existe=False, ativo=False)
+    cache_status_usuario.set(nome_usuario, status)
+    return status
+
+def get_status_usuarios(nomes_usuario: Iterable[str]) -> dict[str, StatusUsuario]:
+    """
+    Retorna o status de vários usuários, consultando antes o cache
+    e buscando os demais com uma consulta IN por lote
+    """
     
-    query = select(Usuario).where(Usuario.nome_usuario == nome_usuario)
+    status_usuarios = {}
+    faltantes = []
+    for nome_usuario in set(nomes_usuario):
+        if (status := cache_status_usuario.get(nome_usuario)) is not None:
+            status_usuarios[nome_usuario] = status
+        else:
+            faltantes.append(nome_usuario)
+    
+    with Session(engine) as session:
+        for lote in em_lotes(faltantes):
+            linhas = session.exec(
+                select(Usuario.nome_usuario, Usuario.ativo, Usuario.token_version)
+                .where(Usuario.nome_usuario.in_(lote))
+            ).all()
+            for linha in linhas:
+                status_usuarios[linha.nome_usuario] = StatusUsuario(
+                    existe=True, ativo=linha.ativo, token_version=linha.token_version
+                )
+    
+    for nome_usuario in faltantes:
+        status = status_usuarios.setdefault(nome_usuario, StatusUsuario(existe=False, ativo=False))
+        cache_status_usuario.set(nome_usuario, status)
+    return status_usuarios
+
+def invalidar_status_usuario(*nomes_usuario: str):
+    """Descarta o status em cache dos usuários, deve ser chamado após alterá-los"""
+    
+    cache_status_usuario.invalidar(*nomes_usuario)
+    
+def get_permissoes(nome_usuario: str) -> tuple[str, ...]:
+    """Retorna as permissões efetivas de um usuário"""
+    
+    query = (
+        select(Permissao.nome_permissao)
+        .join(UsuarioPermissaoEfetiva, UsuarioPermissaoEfetiva.permissao_id == Permissao.id)
+        .join(Usuario, Usuario.id == UsuarioPermissaoEfetiva.usuario_id)
+        .where(Usuario.nome_usuario == nome_usuario)
+        .order_by(Permissao.id)
+    )
+    with Session(engine) as session:
+        return tuple(session.exec(query).all())
+
+def _query_usuario_grupos_permissoes(nome_usuario: str):
+    """
+    Consulta única do usuário com os nomes de seus grupos (uma linha por grupo)
+    e de suas permissões efetivas, lidas da tabela materializada.
+    """
+    
+    permissoes = (
+        select(func.json_group_array(Permissao.nome_permissao))
+        .join(UsuarioPermissaoEfetiva, UsuarioPermissaoEfetiva.permissao_id == Permissao.id)
+        .where(UsuarioPermissaoEfetiva.usuario_id == Usuario.id)
+        .correlate(Usuario)
+        .scalar_subquery()
+    )
+    return (
+        select(Usuario, Grupo.nome_grupo, permissoes)
+        .options(lazyload(Usuario.grupos))
+        .outerjoin(UsuarioGrupoLink, UsuarioGrupoLink.usuario_id == Usuario.id)
+        .outerjoin(Grupo, Grupo.id == UsuarioGrupoLink.grupo_id)
+        .where(Usuario.nome_usuario == nome_usuario)
+        .order_by(Grupo.id)
+    )
+    
+def _montar_usuario_grupos_permissoes(linhas) -> Optional[UsuarioGruposPermissoes]:
+    """Agrupa as linhas da consulta em um UsuarioGruposPermissoes"""
+    
+    if not linhas:
+        return None
+    
+    usuario, _, permissoes = linhas[0]
+    grupos = tuple(grupo for _, grupo, _ in linhas if grupo is not None)
+    return UsuarioGruposPermissoes(usuario, grupos, tuple(json.loads(permissoes)))
+
+def get_usuario_grupos_permissoes(nome_usuario: str) -> Optional[UsuarioGruposPermissoes]:
+    """
+    Retorna o usuário, seus grupos e suas permissões efetivas
+    em uma única consulta sobre as tabelas de ligação.
+    """
+    
+    with Session(engine) as session:
+        linhas = session.exec(_query_usuario_grupos_permissoes(nome_usuario)).all()
+    return _montar_usuario_grupos_permissoes(linhas)
+
+async def get_usuario_grupos_permissoes_async(
+    nome_usuario: str
+) -> Optional[UsuarioGruposPermissoes]:
+    """Versão assíncrona de get_usuario_grupos_permissoes"""
+    
+    async with AsyncSession(async_engine) as session:
+        linhas = (await session.exec(_query_usuario_grupos_permissoes(nome_usuario))).all()
+    return _montar_usuario_grupos_permissoes(linhas)
+
+def iterar_usuarios_grupos(tamanho_lote: int = 1000) -> Iterator[dict]:
+    """
+    Percorre os usuários com os nomes de seus grupos, em lotes no servidor,
+    mantendo o uso de memória constante independentemente da quantidade de usuários.
+    """
+    
+    query = (
+        select(
+            Usuario.id,
+            Usuario.nome_usuario,
+            Usuario.nome_pessoa,
+            Usuario.email,
+            Usuario.avatar,
+            Usuario.ativo,
+            Grupo.nome_grupo,
+        )
+        .outerjoin(UsuarioGrupoLink, UsuarioGrupoLink.usuario_id == Usuario.id)
+        .outerjoin(Grupo, Grupo.id == UsuarioGrupoLink.grupo_id)
+        .where(Usuario.nome_usuario != 'admin')
+        .order_by(Usuario.id, Grupo.id)
+        .execution_options(yield_per=tamanho_lote)
+    )
     with Session(engine) as session:
-        usuario = session.exec(query).one_or_none()
-        if not usuario:
-            return False
-        permissoes = []
-        grupos = []
-        for grupo in usuario.grupos:
-            grupos.append(grupo.nome_grupo)
-            permissoes.extend(grupo.permissoes)
-        permissoes_txt = [permissao.nome_permissao for permissao in permissoes]
-        permissoes_usuario = list(set(permissoes_txt))
-    return usuario, grupos, permissoes_usuario
\ No newline at end of file
+        # As linhas chegam ordenadas por usuário, uma por grupo
+        for _, linhas in groupby(session.exec(query), key=lambda linha: linha.id):
+            linhas = list(linhas)
+            usuario = linhas[0]
+            yield {
+                "id": usuario.id,
+                "nome_usuario": usuario.nome_usuario,
+                "nome_pessoa": usuario.nome_pessoa,
+                "email": usuario.email,
+                "avatar": usuario.avatar,
+                "ativo": usuario.ativo,
+                "grupos": [linha.nome_grupo for linha in linhas if linha.nome_grupo is not None],
+            }
@@ -0,0 +1,28 @@
+"""
+Benchmarks reproduzíveis, executados a partir da raiz do repositório:
+
+    python -m benchmarks.tokens
+    python -m benchmarks.jwt_backends
+    python -m benchmarks.sqlite
+
+O banco e as chaves da API são relativos ao diretório atual, então cada
+benchmark roda em um diretório temporário (preparar_diretorio), antes de
+importar a aplicação.
+"""
+
+import os
+import tempfile
+import timeit
+from typing import Callable
+
+def preparar_diretorio() -> str:
+    """Muda para um diretório temporário novo e o retorna"""
+    
+    diretorio = tempfile.mkdtemp(prefix="api-benchmark-")
+    os.chdir(diretorio)
+    return diretorio
+
+def ops_por_segundo(funcao: Callable[[], object], numero: int, repeticoes: int = 3) -> float:
+    """Melhor vazão entre as repetições, em operações por segundo"""
+    
+    return numero / min(timeit.repeat(funcao, number=numero, repeat=repeticoes))
@@ -0,0 +1,73 @@
+"""
+Vazão de assinatura e verificação de cada backend JWT (api.jwt_backends),
+com HS256 e RS256, sobre as claims reais do access e do refresh token.
+"""
+
+from benchmarks import ops_por_segundo, preparar_diretorio
+
+preparar_diretorio()
+
+import uuid
+from datetime import datetime, timedelta
+
+from dateutil import tz
+
+from api.chaves import Chaveiro
+from api.config import SECRET_KEY
+from api.jwt_backends import BACKENDS
+
+def claims_access_token() -> dict:
+    """Claims emitidas por login_de_acesso, com a lista de permissões"""
+    
+    return {
+        "sub": "admin",
+        "grupos": ["admins", "usuarios"],
+        "permissoes": [
+            "all:all", "read:usuario", "add:usuario", "update:usuario",
+            "read:grupo", "add:grupo", "update:grupo", "read:permissao",
+        ],
+        "fresh": True,
+        "tv": 0,
+        "exp": datetime.now(tz=tz.tzutc()) + timedelta(hours=1),
+        "scope": "access_token",
+    }
+    
+def claims_refresh_token() -> dict:
+    return {
+        "sub": "admin",
+        "jti": uuid.uuid4().hex,
+        "fam": uuid.uuid4().hex,
+        "tv": 0,
+        "exp": datetime.now(tz=tz.tzutc()) + timedelta(hours=10),
+        "scope": "refresh_token",
+    }
+
+def main():
+    chaveiro = Chaveiro("chaves", "RS256")
+    chaveiro.manter()
+    ativa = chaveiro.ativa
+    algoritmos = (
+        ("HS256", SECRET_KEY, SECRET_KEY, None, 2000),
+        ("RS256", ativa.privada, ativa.publica, {"kid": ativa.kid}, 200),
+    )
+    tokens = {"access": claims_access_token(), "refresh": claims_refresh_token()}
+    
+    print(f"{'backend':8} {'alg':6} {'token':8} {'bytes':>6} {'assinaturas/s':>14} {'verificações/s':>15}")
+    for nome_backend, classe in BACKENDS.items():
+        backend = classe()
+        for algoritmo, privada, publica, headers, numero in algoritmos:
+            for tipo, claims in tokens.items():
+                token = backend.codificar(dict(claims), privada, algoritmo, headers)
+                assinaturas = ops_por_segundo(
+                    lambda: backend.codificar(dict(claims), privada, algoritmo, headers), numero
+                )
+                verificacoes = ops_por_segundo(
+                    lambda: backend.decodificar(token, publica, [algoritmo]), numero
+                )
+                print(
+                    f"{nome_backend:8} {algoritmo:6} {tipo:8} {len(token):>6} "
+                    f"{assinaturas:>14,.0f} {verificacoes:>15,.0f}"
+                )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+Vazão e latência de leituras e escritas concorrentes no SQLite, comparando
+o engine padrão do SQLAlchemy (sem pragmas) com o perfil configurado em
+api.config (SQLITE_PRAGMAS, SQLITE_POOL_SIZE e SQLITE_MAX_OVERFLOW).
+"""
+
+from benchmarks import preparar_diretorio
+
+preparar_diretorio()
+
+import random
+import statistics
+import threading
+import time
+
+from sqlalchemy import event, insert, update
+from sqlalchemy.exc import OperationalError
+from sqlmodel import Session, SQLModel, create_engine, select
+
+from api.config import SQLITE_MAX_OVERFLOW, SQLITE_POOL_SIZE
+from api.database import aplicar_pragmas
+from api.models.usuario import Usuario
+
+QUANTIDADE_USUARIOS = 1000
+THREADS = 8
+DURACAO = 3.0  # segundos por cenário
+# Fração de escritas em cada cenário
+CENARIOS = {"leitura": 0.0, "misto": 0.2, "escrita": 1.0}
+
+def criar_engine(perfil: str):
+    arquivo = f"sqlite:///{perfil}.db"
+    if perfil == "padrao":
+        return create_engine(arquivo, connect_args={"check_same_thread": False})
+    engine = create_engine(
+        arquivo,
+        connect_args={"check_same_thread": False},
+        pool_size=SQLITE_POOL_SIZE,
+        max_overflow=SQLITE_MAX_OVERFLOW,
+    )
+    event.listen(engine, "connect", aplicar_pragmas)
+    return engine
+
+def popular(engine):
+    SQLModel.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(
+            insert(Usuario),
+            [
+                {
+                    "nome_usuario": f"usuario{i}",
+                    "nome_pessoa": f"Usuário {i}",
+                    "senha": "hash",
+                    "email": f"usuario{i}@exemplo.com",
+                    "ativo": True,
+                    "token_version": 0,
+                }
+                for i in range(QUANTIDADE_USUARIOS)
+            ],
+        )
+
+def ler(engine, nome_usuario: str):
+    with Session(engine) as session:
+        session.exec(
+            select(Usuario.ativo, Usuario.token_version).where(Usuario.nome_usuario == nome_usuario)
+        ).first()
+        
+def escrever(engine, nome_usuario: str):
+    with Session(engine) as session:
+        session.execute(
+            update(Usuario)
+            .where(Usuario.nome_usuario == nome_usuario)
+            .values(token_version=Usuario.token_version + 1)
+        )
+        session.commit()
+
+def executar(engine, fracao_escritas: float) -> dict:
+    latencias: list[float] = []
+    erros = 0
+    lock = threading.Lock()
+    fim = time.perf_counter() + DURACAO
+    
+    def trabalhar(semente: int):
+        nonlocal erros
+        aleatorio = random.Random(semente)
+        minhas, meus_erros = [], 0
+        while time.perf_counter() < fim:
+            nome_usuario = f"usuario{aleatorio.randrange(QUANTIDADE_USUARIOS)}"
+            operacao = escrever if aleatorio.random() < fracao_escritas else ler
+            inicio = time.perf_counter()
+            try:
+                operacao(engine, nome_usuario)
+            except OperationalError:
+                meus_erros += 1
+                continue
+            minhas.append(time.perf_counter() - inicio)
+        with lock:
+            latencias.extend(minhas)
+            erros += meus_erros
+            
+    threads = [threading.Thread(target=trabalhar, args=(i,)) for i in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+        
+    latencias.sort()
+    return {
+        "ops/s": len(latencias) / DURACAO,
+        "p50 ms": statistics.median(latencias) * 1000 if latencias else 0.0,
+        "p99 ms": latencias[int(len(latencias) * 0.99)] * 1000 if latencias else 0.0,
+        "erros": erros,
+    }
+
+def main():
+    engines = {perfil: criar_engine(perfil) for perfil in ("padrao", "perfil")}
+    for engine in engines.values():
+        popular(engine)
+        
+    print(f"{THREADS} threads, {DURACAO:.0f}s por cenário")
+    print(f"{'cenário':8} {'engine':7} {'ops/s':>10} {'p50 ms':>8} {'p99 ms':>8} {'erros':>6}")
+    for cenario, fracao_escritas in CENARIOS.items():
+        for perfil, engine in engines.items():
+            resultado = executar(engine, fracao_escritas)
+            print(
+                f"{cenario:8} {perfil:7} {resultado['ops/s']:>10,.0f} "
+                f"{resultado['p50 ms']:>8.2f} {resultado['p99 ms']:>8.2f} {resultado['erros']:>6}"
+            )
+    for engine in engines.values():
+        engine.dispose()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Tamanho do access token e custo de decodificação e verificação das
+permissões com a lista de nomes ("permissoes") e com o bitset compacto
+("pm" e "pv"), para 10, 100 e 1000 permissões.
+"""
+
+from benchmarks import ops_por_segundo, preparar_diretorio
+
+preparar_diretorio()
+
+from datetime import datetime, timedelta
+
+from dateutil import tz
+from sqlmodel import Session
+
+from api.auth import mascara_permissoes_token
+from api.chaves import Chaveiro
+from api.config import SECRET_KEY
+from api.database import create_db_and_tables, engine
+from api.jwt_backends import BACKENDS
+from api.models.usuario import Permissao
+from api.services.permissao import registro_permissoes
+
+QUANTIDADES = (10, 100, 1000)
+
+def criar_permissoes(quantidade: int):
+    with Session(engine) as session:
+        for i in range(quantidade):
+            session.add(Permissao(nome_permissao=f"acao{i}:recurso{i}"))
+        session.commit()
+    registro_permissoes.reconstruir()
+
+def claims_token(permissoes: dict) -> dict:
+    return {
+        "sub": "admin",
+        "grupos": ["admins"],
+        **permissoes,
+        "fresh": True,
+        "tv": 0,
+        "exp": datetime.now(tz=tz.tzutc()) + timedelta(hours=1),
+        "scope": "access_token",
+    }
+
+def main():
+    create_db_and_tables()
+    criar_permissoes(max(QUANTIDADES))
+    chaveiro = Chaveiro("chaves", "RS256")
+    chaveiro.manter()
+    ativa = chaveiro.ativa
+    algoritmos = (
+        ("HS256", SECRET_KEY, SECRET_KEY, None),
+        ("RS256", ativa.privada, ativa.publica, {"kid": ativa.kid}),
+    )
+    requisitos = registro_permissoes.compilar_requisitos(["acao0:recurso0"])
+    
+    print(f"{'backend':8} {'alg':6} {'permissões':>10} {'formato':8} {'bytes':>8} {'decodificação/s':>16} {'verificação/s':>14}")
+    for nome_backend, classe in BACKENDS.items():
+        backend = classe()
+        for algoritmo, privada, publica, headers in algoritmos:
+            for quantidade in QUANTIDADES:
+                nomes = [f"acao{i}:recurso{i}" for i in range(quantidade)]
+                mascara = registro_permissoes.compilar(nomes)
+                formatos = {
+                    "lista": {"permissoes": nomes},
+                    "compacto": {
+                        "pm": registro_permissoes.codificar(mascara),
+                        "pv": registro_permissoes.assinatura(mascara),
+                    },
+                }
+                for formato, permissoes in formatos.items():
+                    token = backend.codificar(claims_token(permissoes), privada, algoritmo, headers)
+                    payload = backend.decodificar(token, publica, [algoritmo])
+                    decodificacoes = ops_por_segundo(
+                        lambda: backend.decodificar(token, publica, [algoritmo]), 200
+                    )
+                    # Só a conversão das claims já decodificadas em máscara e o teste de permissão;
+                    # a decodificação é medida na coluna anterior
+                    verificacoes = ops_por_segundo(
+                        lambda: registro_permissoes.atende(
+                            mascara_permissoes_token(payload), requisitos
+                        ),
+                        200,
+                    )
+                    print(
+                        f"{nome_backend:8} {algoritmo:6} {quantidade:>10} {formato:8} "
+                        f"{len(token):>8} {decodificacoes:>16,.0f} {verificacoes:>14,.0f}"
+                    )
+
+if __name__ == "__main__":
+    main()
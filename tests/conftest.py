@@ -0,0 +1,52 @@
+"""
+Configuração dos testes. O banco SQLite e o diretório de chaves são
+relativos ao diretório atual, então os testes rodam em um diretório
+temporário, criado antes de importar a aplicação.
+"""
+
+import os
+import sys
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.chdir(tempfile.mkdtemp(prefix="api-testes-"))
+
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+from api.app import app
+from api.database import engine
+
+@pytest.fixture(scope="session")
+def cliente():
+    """Cliente da aplicação, com o banco criado e populado pelo lifespan"""
+    
+    with TestClient(app) as cliente:
+        yield cliente
+
+@pytest.fixture(scope="session")
+def tokens_admin(cliente) -> dict:
+    """Tokens do usuário admin criado na inicialização"""
+    
+    resposta = cliente.post("/token", data={"username": "admin", "password": "admin"})
+    assert resposta.status_code == 200, resposta.text
+    return resposta.json()
+
+@pytest.fixture
+def cabecalhos_admin(tokens_admin) -> dict:
+    return {"Authorization": f"Bearer {tokens_admin['access_token']}"}
+
+@pytest.fixture
+def consultas():
+    """Registra as instruções SQL executadas pelo engine síncrono durante o teste"""
+    
+    instrucoes: list[str] = []
+    
+    def registrar(conn, cursor, instrucao, parametros, context, executemany):
+        instrucoes.append(instrucao)
+        
+    event.listen(engine, "before_cursor_execute", registrar)
+    yield instrucoes
+    event.remove(engine, "before_cursor_execute", registrar)
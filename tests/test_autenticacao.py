@@ -0,0 +1,128 @@
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import update
+from sqlmodel import Session
+
+import api.auth
+from api.auth import IdentidadeAtiva, ValidarPermissoes, cache_claims, decodificar_token
+from api.database import engine
+from api.models.token import RotacaoRefreshToken
+from api.services.permissao import registro_permissoes
+from api.services.usuario import (
+    StatusUsuario,
+    cache_status_usuario, 
+    get_status_usuario,
+    get_usuario_grupos_permissoes,
+)
+
+# Mesmas dependências de autenticação de GET /usuarios/{id}, sem o corpo da rota
+app_autenticacao = FastAPI()
+
+@app_autenticacao.get(
+    "/autenticado",
+    dependencies=[Depends(ValidarPermissoes(["read:usuario"])), IdentidadeAtiva]
+)
+async def autenticado():
+    return {}
+
+def _contar_decodificacoes(monkeypatch) -> list:
+    chamadas = []
+    decodificar = api.auth.backend_jwt.decodificar
+    
+    def decodificar_contando(*args, **kwargs):
+        chamadas.append(args[0])
+        return decodificar(*args, **kwargs)
+    
+    monkeypatch.setattr(api.auth.backend_jwt, "decodificar", decodificar_contando)
+    return chamadas
+
+def _esfriar_caches():
+    cache_claims.limpar()
+    cache_status_usuario.limpar()
+
+def test_autenticacao_decodifica_uma_vez_e_faz_uma_consulta(
+    cliente, cabecalhos_admin, consultas, monkeypatch
+):
+    decodificacoes = _contar_decodificacoes(monkeypatch)
+    _esfriar_caches()
+    # Força a verificação periódica do registro a coincidir com a requisição
+    registro_permissoes._verificado_em = 0.0
+    
+    resposta = TestClient(app_autenticacao).get("/autenticado", headers=cabecalhos_admin)
+    
+    assert resposta.status_code == 200, resposta.text
+    assert len(decodificacoes) == 1
+    assert len(consultas) <= 1, consultas
+
+def test_autenticacao_com_caches_quentes_nao_consulta_o_banco(
+    cliente, cabecalhos_admin, consultas, monkeypatch
+):
+    cliente_autenticacao = TestClient(app_autenticacao)
+    cliente_autenticacao.get("/autenticado", headers=cabecalhos_admin)
+    decodificacoes = _contar_decodificacoes(monkeypatch)
+    consultas.clear()
+    
+    resposta = cliente_autenticacao.get("/autenticado", headers=cabecalhos_admin)
+    
+    assert resposta.status_code == 200, resposta.text
+    assert decodificacoes == []
+    assert consultas == []
+
+def test_buscar_usuario_por_id_decodifica_o_token_uma_vez(
+    cliente, cabecalhos_admin, consultas, monkeypatch
+):
+    decodificacoes = _contar_decodificacoes(monkeypatch)
+    _esfriar_caches()
+    registro_permissoes._verificado_em = 0.0
+    
+    resposta = cliente.get("/usuarios/1", headers=cabecalhos_admin)
+    
+    assert resposta.status_code == 200, resposta.text
+    assert resposta.json()["nome_usuario"] == "admin"
+    assert len(decodificacoes) == 1
+    # Uma consulta da autenticação (status) e as da própria rota (usuário e grupos)
+    assert len(consultas) <= 3, consultas
+    # O status e a versão das permissões saem da mesma consulta
+    assert sum("versao_permissoes" in consulta for consulta in consultas) == 1
+
+def test_usuario_grupos_permissoes_de_usuario_inexistente(cliente):
+    assert get_usuario_grupos_permissoes("inexistente") is None
+    
+def test_login_de_usuario_inexistente(cliente):
+    resposta = cliente.post("/token", data={"username": "inexistente", "password": "x"})
+    
+    assert resposta.status_code == 401
+
+def test_login_usa_o_token_version_do_banco_e_nao_o_do_cache(cliente):
+    atual = get_status_usuario("admin")
+    # Status defasado, como o de um processo que não viu a última revogação
+    cache_status_usuario.set(
+        "admin", StatusUsuario(existe=True, ativo=True, token_version=atual.token_version - 1)
+    )
+    
+    resposta = cliente.post("/token", data={"username": "admin", "password": "admin"})
+    cache_status_usuario.limpar()
+    
+    tokens = resposta.json()
+    assert decodificar_token(tokens["access_token"])["tv"] == atual.token_version
+    assert decodificar_token(tokens["refresh_token"])["tv"] == atual.token_version
+
+def test_introspeccao_ve_refresh_token_consumido_por_outro_processo(cliente, cabecalhos_admin):
+    consumido = cliente.post("/token", data={"username": "admin", "password": "admin"}).json()
+    vigente = cliente.post("/token", data={"username": "admin", "password": "admin"}).json()
+    # Consumo feito por outro worker: a tabela muda, os índices deste processo não
+    jti = decodificar_token(consumido["refresh_token"])["jti"]
+    with Session(engine) as session:
+        session.execute(
+            update(RotacaoRefreshToken).where(RotacaoRefreshToken.jti == jti).values(consumido=True)
+        )
+        session.commit()
+    
+    resposta = cliente.post(
+        "/token/introspeccao", 
+        json={"tokens": [consumido["refresh_token"], vigente["refresh_token"]]}, 
+        headers=cabecalhos_admin
+    )
+    
+    assert resposta.status_code == 200, resposta.text
+    assert [r["active"] for r in resposta.json()["resultados"]] == [False, True]
@@ -0,0 +1,26 @@
+def test_decisoes_aceitam_texto_objeto_e_lista(cliente, tokens_admin):
+    resposta = cliente.post(
+        "/autorizacao/decisoes",
+        json={
+            "token": tokens_admin["access_token"],
+            "permissoes": [
+                "read:usuario",
+                {"acao": "add", "recurso": "grupo"},
+                ["update", "usuario"],
+            ],
+        },
+    )
+    
+    assert resposta.status_code == 200, resposta.text
+    assert [d["permissao"] for d in resposta.json()["decisoes"]] == [
+        "read:usuario", "add:grupo", "update:usuario"
+    ]
+    assert all(d["permitido"] for d in resposta.json()["decisoes"])
+    
+def test_decisoes_rejeitam_lista_com_tamanho_diferente_de_dois(cliente, tokens_admin):
+    resposta = cliente.post(
+        "/autorizacao/decisoes",
+        json={"token": tokens_admin["access_token"], "permissoes": [["read", "usuario", "x"]]},
+    )
+    
+    assert resposta.status_code == 422
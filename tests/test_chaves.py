@@ -0,0 +1,62 @@
+import os
+import threading
+
+import pytest
+from jose import JWTError
+
+from api.auth import cache_claims, decodificar_token
+from api.chaves import Chaveiro, chaveiro
+from api.jwt_backends import backend_jwt
+
+def _token_assinado_por(kid: str) -> str:
+    chave = chaveiro._chaves[kid]
+    return backend_jwt.codificar(
+        {"sub": "admin", "exp": 4102444800},
+        chave.privada,
+        chaveiro.algoritmo,
+        headers={"kid": kid},
+    )
+
+def test_aposentar_chave_descarta_claims_em_cache(cliente):
+    kid = chaveiro.rotacionar()
+    assert kid != chaveiro.ativa.kid
+    token = _token_assinado_por(kid)
+    assert decodificar_token(token)["sub"] == "admin"
+    assert cache_claims.get(token) is not None
+    
+    chaveiro.aposentar(kid)
+    
+    assert cache_claims.get(token) is None
+    with pytest.raises(JWTError):
+        decodificar_token(token)
+
+def test_aposentar_chave_mantem_claims_das_demais(cliente, tokens_admin):
+    token = tokens_admin["access_token"]
+    decodificar_token(token)
+    kid = chaveiro.rotacionar()
+    
+    chaveiro.aposentar(kid)
+    
+    assert cache_claims.get(token) is not None
+
+def test_workers_simultaneos_reutilizam_a_primeira_chave(tmp_path):
+    chaveiros = [Chaveiro(str(tmp_path), "RS256") for _ in range(4)]
+    threads = [threading.Thread(target=chaveiro.manter) for chaveiro in chaveiros]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+        
+    assert len([a for a in os.listdir(tmp_path) if a.endswith(".pem")]) == 1
+    assert len({chaveiro.ativa.kid for chaveiro in chaveiros}) == 1
+    
+def test_aposentar_chave_ja_removida_por_outro_worker(tmp_path):
+    primeiro, segundo = Chaveiro(str(tmp_path), "RS256"), Chaveiro(str(tmp_path), "RS256")
+    primeiro.manter()
+    kid = primeiro.rotacionar()
+    segundo.carregar()
+    
+    primeiro.aposentar(kid)
+    segundo.aposentar(kid)
+    
+    assert kid not in segundo._chaves
@@ -0,0 +1,162 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from api.app import app
+from api.auth import criar_access_token
+from api.client import ClienteAPI, ClienteAPIAsync
+
+class TransporteRegistrado(httpx.BaseTransport):
+    """Repassa as requisições ao transporte da aplicação, registrando os caminhos"""
+    
+    def __init__(self, transporte: httpx.BaseTransport):
+        self.transporte = transporte
+        self.caminhos: list[str] = []
+        
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        self.caminhos.append(request.url.path)
+        return self.transporte.handle_request(request)
+    
+class TransporteRegistradoAsync(httpx.AsyncBaseTransport):
+    def __init__(self, transporte: httpx.AsyncBaseTransport):
+        self.transporte = transporte
+        self.caminhos: list[str] = []
+        
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        self.caminhos.append(request.url.path)
+        return await self.transporte.handle_async_request(request)
+
+@pytest.fixture
+def transporte(cliente) -> TransporteRegistrado:
+    return TransporteRegistrado(cliente._transport)
+
+def _criar_cliente(transporte, **kwargs) -> ClienteAPI:
+    return ClienteAPI("http://testserver", "admin", "admin", transport=transporte, **kwargs)
+
+def _token_revogado() -> str:
+    """Access token válido, mas com versão de token diferente da do usuário"""
+    
+    return criar_access_token({"sub": "admin", "tv": -1})
+
+def test_renova_o_token_antes_do_exp(transporte):
+    with _criar_cliente(transporte, margem_renovacao=10**9) as api:
+        api.login()
+        primeiro = api._estado.refresh_token
+        
+        assert api.get("/usuarios/me").status_code == 200
+        
+    assert api._estado.refresh_token != primeiro
+    assert transporte.caminhos == ["/token", "/refresh-token", "/usuarios/me"]
+
+def test_renova_e_repete_a_requisicao_apos_401(transporte):
+    with _criar_cliente(transporte) as api:
+        api.login()
+        api._estado.access_token = _token_revogado()
+        
+        resposta = api.get("/usuarios/me")
+        
+    assert resposta.status_code == 200
+    assert transporte.caminhos == ["/token", "/usuarios/me", "/refresh-token", "/usuarios/me"]
+
+def test_refaz_o_login_se_o_refresh_token_for_recusado(transporte):
+    with _criar_cliente(transporte) as api:
+        api.login()
+        api._estado.access_token = _token_revogado()
+        api._estado.refresh_token = "invalido"
+        
+        assert api.get("/usuarios/me").status_code == 200
+        
+    assert transporte.caminhos[-3:] == ["/refresh-token", "/token", "/usuarios/me"]
+
+def test_cache_de_decisoes(transporte):
+    with _criar_cliente(transporte) as api:
+        permissoes = ["read:usuario", "add:grupo"]
+        assert api.decisoes(permissoes) == {"read:usuario": True, "add:grupo": True}
+        assert api.decisoes(permissoes) == {"read:usuario": True, "add:grupo": True}
+        assert api.pode("read:usuario", nome_usuario="admin")
+        assert transporte.caminhos.count("/autorizacao/decisoes") == 2
+        
+        api.limpar_cache_decisoes()
+        api.decisoes(permissoes)
+        
+    assert transporte.caminhos.count("/autorizacao/decisoes") == 3
+    
+def test_decisoes_expiram_apos_o_ttl(transporte):
+    with _criar_cliente(transporte, ttl_decisoes=0.05) as api:
+        api.pode("read:usuario")
+        api.pode("read:usuario")
+        time.sleep(0.1)
+        api.pode("read:usuario")
+        
+    assert transporte.caminhos.count("/autorizacao/decisoes") == 2
+
+def _roteiro_sincrono(transporte) -> list:
+    with _criar_cliente(transporte) as api:
+        api.login()
+        resultados = [
+            api.get("/usuarios/me").json()["nome_usuario"],
+            api.decisoes(["read:usuario", "inexistente:recurso"]),
+            api.pode("read:usuario", nome_usuario="admin"),
+            [r["active"] for r in api.introspectar([api._estado.access_token, "invalido"])],
+        ]
+        api._estado.access_token = _token_revogado()
+        resultados.append(api.get("/usuarios/me").status_code)
+    return resultados
+
+async def _roteiro_assincrono(transporte) -> list:
+    async with ClienteAPIAsync(
+        "http://testserver", "admin", "admin", transport=transporte
+    ) as api:
+        await api.login()
+        resultados = [
+            (await api.get("/usuarios/me")).json()["nome_usuario"],
+            await api.decisoes(["read:usuario", "inexistente:recurso"]),
+            await api.pode("read:usuario", nome_usuario="admin"),
+            [r["active"] for r in await api.introspectar([api._estado.access_token, "invalido"])],
+        ]
+        api._estado.access_token = _token_revogado()
+        resultados.append((await api.get("/usuarios/me")).status_code)
+    return resultados
+
+def test_clientes_sincrono_e_assincrono_sao_equivalentes(transporte):
+    transporte_async = TransporteRegistradoAsync(httpx.ASGITransport(app=app))
+    
+    sincrono = _roteiro_sincrono(transporte)
+    assincrono = asyncio.run(_roteiro_assincrono(transporte_async))
+    
+    assert sincrono == assincrono == [
+        "admin",
+        # O admin possui all:all
+        {"read:usuario": True, "inexistente:recurso": True},
+        True,
+        [True, False],
+        200,
+    ]
+    assert transporte.caminhos == transporte_async.caminhos
+
+def test_permissao_negada_nao_renova_o_token(cliente, cabecalhos_admin, transporte):
+    grupo = cliente.post(
+        "/grupos", json={"nome_grupo": "sem-permissoes", "permissoes_id": []}, headers=cabecalhos_admin
+    ).json()
+    resposta = cliente.post(
+        "/usuarios",
+        data={
+            "nome_usuario": "sem-grupos", 
+            "nome_pessoa": "Sem Grupos", 
+            "senha": "senha", 
+            "email": "sem-grupos@x",
+            "grupos": [grupo["id"]],
+        },
+        headers=cabecalhos_admin,
+    )
+    assert resposta.status_code == 201, resposta.text
+    
+    with ClienteAPI(
+        "http://testserver", "sem-grupos", "senha", transport=transporte
+    ) as api:
+        respostas = [api.get("/grupos") for _ in range(3)]
+        
+    assert [r.status_code for r in respostas] == [401, 401, 401]
+    assert transporte.caminhos == ["/token", "/grupos", "/grupos", "/grupos"]
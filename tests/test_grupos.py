@@ -0,0 +1,32 @@
+def _criar_grupo(cliente, cabecalhos, **dados) -> dict:
+    resposta = cliente.post("/grupos", json=dados, headers=cabecalhos)
+    assert resposta.status_code in (200, 201), resposta.text
+    return resposta.json()
+
+def test_patch_sem_grupo_pai_mantem_o_grupo_no_lugar(cliente, cabecalhos_admin):
+    pai = _criar_grupo(cliente, cabecalhos_admin, nome_grupo="hierarquia-pai")
+    filho = _criar_grupo(
+        cliente, cabecalhos_admin, nome_grupo="hierarquia-filho", grupo_pai_id=pai["id"]
+    )
+    
+    resposta = cliente.patch(
+        f"/grupos/{filho['id']}", 
+        json={"nome_grupo": "hierarquia-filho", "permissoes_id": [2]}, 
+        headers=cabecalhos_admin
+    )
+    
+    assert resposta.status_code == 200, resposta.text
+    assert resposta.json()["grupo_pai_id"] == pai["id"]
+    
+def test_patch_com_grupo_pai_nulo_move_para_a_raiz(cliente, cabecalhos_admin):
+    pai = _criar_grupo(cliente, cabecalhos_admin, nome_grupo="raiz-pai")
+    filho = _criar_grupo(cliente, cabecalhos_admin, nome_grupo="raiz-filho", grupo_pai_id=pai["id"])
+    
+    resposta = cliente.patch(
+        f"/grupos/{filho['id']}", 
+        json={"nome_grupo": "raiz-filho", "grupo_pai_id": None}, 
+        headers=cabecalhos_admin
+    )
+    
+    assert resposta.status_code == 200, resposta.text
+    assert resposta.json()["grupo_pai_id"] is None
@@ -0,0 +1,55 @@
+import json
+
+def _importar(cliente, cabecalhos, linhas: list[str]):
+    conteudo = "\n".join(linhas).encode()
+    return cliente.post(
+        "/usuarios/importar",
+        files={"arquivo": ("usuarios.ndjson", conteudo, "application/x-ndjson")},
+        headers=cabecalhos,
+    )
+
+def _usuario(nome: str, **extras) -> str:
+    return json.dumps({
+        "nome_usuario": nome,
+        "nome_pessoa": nome.title(),
+        "senha": "senha",
+        "email": f"{nome}@importacao",
+        **extras,
+    })
+
+def test_linha_malformada_nao_impede_as_demais(cliente, cabecalhos_admin):
+    resposta = _importar(
+        cliente, 
+        cabecalhos_admin, 
+        [_usuario("importado1"), "{json ruim", "[1, 2]", _usuario("importado2")]
+    )
+    
+    assert resposta.status_code == 200, resposta.text
+    relatorio = resposta.json()
+    assert relatorio["criados"] == 2
+    assert relatorio["erros"] == 2
+    erros = {r["linha"]: r["detalhe"] for r in relatorio["resultados"] if not r["criado"]}
+    assert erros[2].startswith("JSON inválido")
+    assert erros[3] == "Dados inválidos: cada linha deve ser um objeto"
+    
+def test_nome_de_usuario_nao_textual_e_erro_da_linha(cliente, cabecalhos_admin):
+    resposta = _importar(
+        cliente, 
+        cabecalhos_admin, 
+        [json.dumps({"nome_usuario": 5, "nome_pessoa": "X", "senha": "s", "email": "x@y"})]
+    )
+    
+    assert resposta.status_code == 200, resposta.text
+    relatorio = resposta.json()
+    assert relatorio["erros"] == 1
+    assert relatorio["resultados"][0]["nome_usuario"] is None
+    assert relatorio["resultados"][0]["detalhe"].startswith("Dados inválidos")
+    
+def test_arquivo_fora_do_utf8(cliente, cabecalhos_admin):
+    resposta = cliente.post(
+        "/usuarios/importar",
+        files={"arquivo": ("usuarios.ndjson", b"\xff\xfe\xfa", "application/x-ndjson")},
+        headers=cabecalhos_admin,
+    )
+    
+    assert resposta.status_code == 400
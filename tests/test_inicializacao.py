@@ -0,0 +1,25 @@
+import os
+import subprocess
+import sys
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def test_banco_novo_inicia_sem_divergencia_nas_permissoes_efetivas(tmp_path):
+    # Processo separado: o banco dos demais testes já foi inicializado
+    script = (
+        "from fastapi.testclient import TestClient\n"
+        "from api.app import app\n"
+        "from api.services.permissao import verificar_permissoes_efetivas\n"
+        "with TestClient(app):\n"
+        "    print(verificar_permissoes_efetivas(corrigir=False))\n"
+    )
+    ambiente = {**os.environ, "PYTHONPATH": RAIZ}
+    resultado = subprocess.run(
+        [sys.executable, "-c", script], cwd=tmp_path, env=ambiente, 
+        capture_output=True, text=True, timeout=120
+    )
+    
+    assert resultado.returncode == 0, resultado.stderr
+    assert "Usuário admin criado com sucesso!" in resultado.stdout
+    assert "Permissões efetivas reconstruídas" not in resultado.stdout
+    assert "{'faltantes': 0, 'sobrando': 0, 'contagem_divergente': 0}" in resultado.stdout
@@ -0,0 +1,35 @@
+import pytest
+
+@pytest.mark.parametrize(
+    "url, vinculo",
+    [
+        ("/usuarios/grupos/lote", {"usuario_id": 1, "grupo_id": 1}),
+        ("/grupos/permissoes/lote", {"grupo_id": 1, "permissao_id": 1}),
+    ],
+)
+def test_lote_rejeita_vinculo_em_adicionar_e_remover(cliente, cabecalhos_admin, url, vinculo):
+    resposta = cliente.post(
+        url, json={"adicionar": [vinculo], "remover": [vinculo]}, headers=cabecalhos_admin
+    )
+    
+    assert resposta.status_code == 422
+    
+def test_lote_adiciona_e_remove_vinculos(cliente, cabecalhos_admin):
+    grupo = cliente.post(
+        "/grupos", json={"nome_grupo": "lote", "permissoes_id": [2]}, headers=cabecalhos_admin
+    ).json()
+    
+    resposta = cliente.post(
+        "/grupos/permissoes/lote",
+        json={
+            "adicionar": [{"grupo_id": grupo["id"], "permissao_id": 3}],
+            "remover": [
+                {"grupo_id": grupo["id"], "permissao_id": 2},
+                {"grupo_id": grupo["id"], "permissao_id": 10**6},
+            ],
+        },
+        headers=cabecalhos_admin,
+    )
+    
+    assert resposta.status_code == 200, resposta.text
+    assert resposta.json() == {"adicionados": 1, "removidos": 1, "ignorados": 1}
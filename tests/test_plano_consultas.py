@@ -0,0 +1,130 @@
+"""
+Verifica, com EXPLAIN QUERY PLAN, que as consultas frequentes usam
+índices em vez de percorrer tabelas inteiras.
+"""
+
+import re
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from dateutil import tz
+from sqlalchemy import event
+from sqlmodel import Session, select
+
+from api.database import engine
+from api.models.usuario import Permissao
+from api.services.evento import usuarios_da_permissao, usuarios_dos_grupos
+from api.services.token import consumir_refresh_token, registrar_refresh_token, revogar_familia
+from api.services.usuario import (
+    cache_status_usuario,
+    get_permissoes,
+    get_status_usuario,
+    get_status_usuarios,
+    get_usuario,
+    get_usuario_grupos_permissoes,
+)
+
+# Linhas do plano que indicam leitura completa de uma tabela
+VARREDURA = re.compile(r"^SCAN (?!CONSTANT ROW)(\w+)")
+
+@contextmanager
+def planos_consultas(filtro: str = ""):
+    """Registra o plano de cada instrução executada no bloco que contém 'filtro'"""
+    
+    planos: list[tuple[str, list[str]]] = []
+    
+    def registrar(conn, cursor, instrucao, parametros, context, executemany):
+        if filtro not in instrucao or instrucao.lstrip().upper().startswith("EXPLAIN"):
+            return
+        if executemany:
+            parametros = parametros[0]
+        linhas = cursor.connection.execute(
+            "EXPLAIN QUERY PLAN " + instrucao, parametros
+        ).fetchall()
+        planos.append((instrucao, [linha[-1] for linha in linhas]))
+        
+    event.listen(engine, "before_cursor_execute", registrar)
+    try:
+        yield planos
+    finally:
+        event.remove(engine, "before_cursor_execute", registrar)
+
+def varreduras(planos: list[tuple[str, list[str]]]) -> list[tuple[str, str]]:
+    return [
+        (instrucao, detalhe)
+        for instrucao, detalhes in planos
+        for detalhe in detalhes
+        if VARREDURA.match(detalhe)
+    ]
+
+def test_consultas_de_autenticacao_usam_indices(cliente):
+    cache_status_usuario.limpar()
+    with planos_consultas() as planos:
+        get_status_usuario("admin")
+        get_status_usuarios(["admin", "inexistente"])
+        get_usuario("admin")
+        get_permissoes("admin")
+        get_usuario_grupos_permissoes("admin")
+        
+    assert planos
+    assert varreduras(planos) == []
+    
+def test_consultas_de_eventos_usam_indices(cliente):
+    with Session(engine) as session:
+        permissao_id = session.exec(select(Permissao.id)).first()
+        with planos_consultas() as planos:
+            usuarios_da_permissao(session, permissao_id)
+            usuarios_dos_grupos(session, [1])
+            
+    assert varreduras(planos) == []
+
+def test_rotacao_de_refresh_token_usa_indices(cliente):
+    expira_em = datetime.now(tz=tz.tzutc()) + timedelta(minutes=5)
+    registrar_refresh_token("jti-plano", "familia-plano", "admin", expira_em)
+    with planos_consultas("rotacaorefreshtoken") as planos:
+        consumir_refresh_token("jti-plano", "familia-plano", expira_em)
+        revogar_familia("familia-plano")
+        
+    assert planos
+    assert varreduras(planos) == []
+
+def test_atualizacao_das_permissoes_efetivas_usa_indices(cliente, cabecalhos_admin):
+    with planos_consultas("usuario_permissao_efetiva") as planos:
+        pai = cliente.post(
+            "/grupos", json={"nome_grupo": "plano-pai", "permissoes_id": [2]}, headers=cabecalhos_admin
+        ).json()
+        resposta = cliente.post(
+            "/usuarios",
+            data={
+                "nome_usuario": "plano", 
+                "nome_pessoa": "Plano", 
+                "senha": "senha", 
+                "email": "plano@x", 
+                "grupos": [pai["id"]]
+            },
+            headers=cabecalhos_admin,
+        )
+        assert resposta.status_code == 201, resposta.text
+        usuario_id = get_usuario("plano").id
+        cliente.patch(
+            f"/grupos/{pai['id']}", 
+            json={"nome_grupo": "plano-pai", "permissoes_id": [3]}, 
+            headers=cabecalhos_admin
+        )
+        filho = cliente.post(
+            "/grupos", 
+            json={"nome_grupo": "plano-filho", "grupo_pai_id": pai["id"]}, 
+            headers=cabecalhos_admin
+        ).json()
+        cliente.patch(
+            f"/usuarios/{usuario_id}/grupos", json={"grupos": [filho["id"]]}, headers=cabecalhos_admin
+        )
+        cliente.patch(
+            f"/grupos/{filho['id']}", 
+            json={"nome_grupo": "plano-filho", "grupo_pai_id": None}, 
+            headers=cabecalhos_admin
+        )
+        
+    instrucoes = {instrucao.split()[0].upper() for instrucao, _ in planos}
+    assert {"INSERT", "DELETE"} <= instrucoes
+    assert varreduras(planos) == []
@@ -0,0 +1,29 @@
+import inspect
+
+from fastapi.routing import APIRoute
+
+from api.app import app
+from api.auth import ValidarPermissoes
+from api.database import get_session
+
+def _usa_sessao_sincrona(dependant) -> bool:
+    return any(
+        dependencia.call is get_session or _usa_sessao_sincrona(dependencia)
+        for dependencia in dependant.dependencies
+    )
+
+def test_rotas_com_sessao_sincrona_rodam_no_threadpool():
+    """Rotas async com a sessão síncrona bloqueariam o event loop em cada consulta"""
+    
+    bloqueantes = [
+        route.path
+        for route in app.routes
+        if isinstance(route, APIRoute)
+        and _usa_sessao_sincrona(route.dependant)
+        and inspect.iscoroutinefunction(route.endpoint)
+    ]
+    
+    assert bloqueantes == []
+    
+def test_validar_permissoes_roda_no_threadpool():
+    assert not inspect.iscoroutinefunction(ValidarPermissoes.__call__)